@@ -3,14 +3,23 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 import os
 
+# Псевдоним: имя settings занято обработчиком страницы /settings ниже
+from app.config import settings as app_settings
 from app.database import get_db, init_db
-from app.types import JobSearchCreate, JobSearchResponse, ApplicationResponse
+from app.types import (
+    JobSearchCreate, JobSearchResponse, ApplicationResponse, ApplicationPage, ApplicationStats,
+    RequestLogResponse, RequestLogPage
+)
 from app.services import auto_apply_service
 from app.utils.hh_api import hh_api_client
+from app.utils.hh_oauth import hh_oauth_client
+from app.utils.request_log import request_log_writer
+from app.utils.credentials import credentials_cache
+from app.utils.token_refresher import token_refresher
 from app.utils.auth import get_current_user
 from app.auth import router as auth_router
 from app.oauth import router as oauth_router
@@ -31,13 +40,27 @@ async def startup_event():
     """Инициализация при запуске"""
     await init_db()
     print("База данных инициализирована")
+    await hh_oauth_client.open()
+    
+    # Фоновое обновление токенов и отклик выполняет воркер; веб-процесс делает это
+    # только во встроенном режиме, иначе два процесса отправили бы один refresh token
+    if app_settings.embedded_worker:
+        token_refresher.start()
+        # Продолжаем отклик, если он был включен до перезапуска
+        from app.database import AsyncSessionLocal
+        async with AsyncSessionLocal() as session:
+            if await auto_apply_service.is_auto_apply_enabled(session):
+                auto_apply_service.start_auto_apply()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Очистка при завершении"""
-    await hh_api_client.close()
     auto_apply_service.stop_auto_apply()
+    token_refresher.stop()
+    await request_log_writer.stop()
+    await hh_api_client.close()
+    await hh_oauth_client.close()
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -107,16 +130,50 @@ async def get_job_searches(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/applications", response_model=List[ApplicationResponse])
+def _page_size(limit: Optional[int]) -> int:
+    """Размер страницы из запроса, ограниченный сверху настройкой"""
+    return min(max(limit or app_settings.api_page_size, 1), app_settings.api_max_page_size)
+
+
+@app.get("/api/applications", response_model=ApplicationPage)
 async def get_applications(
     current_user_id: int = Depends(get_current_user),
     job_search_id: int = None,
+    status: str = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    session: AsyncSession = Depends(get_db)
+):
+    """Страница откликов текущего пользователя (следующая - по next_cursor)"""
+    try:
+        applications, next_cursor = await auto_apply_service.get_applications(
+            session, current_user_id, job_search_id,
+            status=status,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=_page_size(limit)
+        )
+        return ApplicationPage(
+            items=[ApplicationResponse.from_orm(app) for app in applications],
+            next_cursor=next_cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/applications/stats", response_model=ApplicationStats)
+async def get_application_stats(
+    current_user_id: int = Depends(get_current_user),
     session: AsyncSession = Depends(get_db)
 ):
-    """Получение откликов текущего пользователя"""
+    """Число откликов текущего пользователя по статусам"""
     try:
-        applications = await auto_apply_service.get_applications(session, current_user_id, job_search_id)
-        return [ApplicationResponse.from_orm(app) for app in applications]
+        return ApplicationStats(**await auto_apply_service.get_application_stats(session, current_user_id))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -152,31 +209,40 @@ async def deactivate_job_search(
 
 
 @app.post("/api/start-auto-apply")
-async def start_auto_apply():
+async def start_auto_apply(session: AsyncSession = Depends(get_db)):
     """Запуск автоматического отклика"""
     try:
-        auto_apply_service.start_auto_apply()
+        await auto_apply_service.set_auto_apply_enabled(session, True)
+        if app_settings.embedded_worker:
+            auto_apply_service.start_auto_apply()
         return {"message": "Автоматический отклик запущен"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/api/stop-auto-apply")
-async def stop_auto_apply():
+async def stop_auto_apply(session: AsyncSession = Depends(get_db)):
     """Остановка автоматического отклика"""
     try:
-        auto_apply_service.stop_auto_apply()
+        await auto_apply_service.set_auto_apply_enabled(session, False)
+        if app_settings.embedded_worker:
+            auto_apply_service.stop_auto_apply()
         return {"message": "Автоматический отклик остановлен"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/api/status")
-async def get_status():
+async def get_status(session: AsyncSession = Depends(get_db)):
     """Получение статуса автоматического отклика"""
     return {
-        "is_running": auto_apply_service.is_running,
-        "check_interval_minutes": auto_apply_service.check_interval_minutes if hasattr(auto_apply_service, 'check_interval_minutes') else 30
+        "is_running": await auto_apply_service.is_auto_apply_enabled(session),
+        "embedded_worker": app_settings.embedded_worker,
+        "check_interval_minutes": auto_apply_service.check_interval_minutes if hasattr(auto_apply_service, 'check_interval_minutes') else 30,
+        "search_cache": hh_api_client.search_cache.stats(),
+        "vacancy_cache": hh_api_client.vacancy_cache.stats(),
+        "http_pool": hh_api_client.pool_monitor.stats(),
+        "apply_queue": await auto_apply_service.apply_queue.stats(session)
     }
 
 
@@ -188,15 +254,7 @@ async def test_connection(
     """Тестирование подключения к API HH.ru"""
     try:
         # Получаем токен текущего пользователя
-        from sqlalchemy import select
-        from app.database import HHUserCredentials
-        
-        result = await session.execute(
-            select(HHUserCredentials).where(
-                HHUserCredentials.user_id == current_user_id
-            ).order_by(HHUserCredentials.created_at.desc()).limit(1)
-        )
-        credentials = result.scalar_one_or_none()
+        credentials = await credentials_cache.get(session, current_user_id)
         
         if not credentials or not credentials.access_token:
             # Логируем отсутствие токена
@@ -258,61 +316,67 @@ async def run_single_check(
 ):
     """Запуск однократной проверки вакансий"""
     try:
+        # Поиск выполняет отдельный воркер - только ставим поиски в очередь
+        if not app_settings.embedded_worker:
+            queued = await auto_apply_service.enqueue_user_searches(session, current_user_id)
+            return {
+                "message": "Проверка поставлена в очередь",
+                "job_searches_queued": queued
+            }
+        
         from app.database import AsyncSessionLocal
         async with AsyncSessionLocal() as session:
             job_searches = await auto_apply_service.get_job_searches(session, current_user_id)
-            total_applied = 0
-            
-            for job_search in job_searches:
-                applied = await auto_apply_service.process_job_search(session, job_search)
-                total_applied += applied
-            
-            return {
-                "message": "Проверка завершена",
-                "job_searches_processed": len(job_searches),
-                "applications_sent": total_applied
-            }
+            total_queued = await auto_apply_service.process_job_searches(
+                session, [job_search.id for job_search in job_searches]
+            )
+        
+        # Сразу отправляем отклики пользователя, которые уже пора отправить
+        total_applied = 0
+        while True:
+            claimed, sent = await auto_apply_service.drain_apply_queue(current_user_id)
+            total_applied += sent
+            if not claimed:
+                break
+        
+        return {
+            "message": "Проверка завершена",
+            "job_searches_processed": len(job_searches),
+            "applications_queued": total_queued,
+            "applications_sent": total_applied
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.get("/api/request-logs")
+@app.get("/api/request-logs", response_model=RequestLogPage)
 async def get_request_logs(
     current_user_id: int = Depends(get_current_user),
-    limit: int = 50,
+    limit: Optional[int] = None,
     request_type: str = None,
     status: str = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    cursor: Optional[str] = None,
     session: AsyncSession = Depends(get_db)
 ):
-    """Получение логов запросов текущего пользователя"""
+    """Страница логов запросов текущего пользователя (следующая - по next_cursor)"""
     try:
-        from sqlalchemy import select, desc
-        from app.database import RequestLog
-        
-        query = select(RequestLog).where(RequestLog.user_id == current_user_id).order_by(desc(RequestLog.created_at))
-        
-        if request_type:
-            query = query.where(RequestLog.request_type == request_type)
-        if status:
-            query = query.where(RequestLog.status == status)
-        
-        query = query.limit(limit)
-        result = await session.execute(query)
-        logs = result.scalars().all()
-        
-        return [
-            {
-                "id": log.id,
-                "user_id": log.user_id,
-                "job_search_id": log.job_search_id,
-                "request_type": log.request_type,
-                "status": log.status,
-                "details": log.details,
-                "error_message": log.error_message,
-                "created_at": log.created_at.isoformat() if log.created_at else None
-            }
-            for log in logs
-        ]
+        logs, next_cursor = await auto_apply_service.get_request_logs(
+            session, current_user_id,
+            request_type=request_type,
+            status=status,
+            date_from=date_from,
+            date_to=date_to,
+            cursor=cursor,
+            limit=_page_size(limit)
+        )
+        return RequestLogPage(
+            items=[RequestLogResponse.from_orm(log) for log in logs],
+            next_cursor=next_cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -324,9 +388,12 @@ async def get_system_settings(
 ):
     """Получение настроек системы"""
     try:
+        min_interval, max_interval = await auto_apply_service.get_check_interval_bounds(session)
         settings_data = {
             "check_interval_minutes": await auto_apply_service.get_check_interval(session),
-            "max_applications_per_day": await auto_apply_service.get_max_applications_per_day(session)
+            "max_applications_per_day": await auto_apply_service.get_max_applications_per_day(session),
+            "min_check_interval_minutes": min_interval,
+            "max_check_interval_minutes": max_interval
         }
         return settings_data
     except Exception as e:
@@ -345,10 +412,33 @@ async def update_system_settings(
         body = await request.json()
         check_interval_minutes = body.get("check_interval_minutes")
         max_applications_per_day = body.get("max_applications_per_day")
+        min_check_interval_minutes = body.get("min_check_interval_minutes")
+        max_check_interval_minutes = body.get("max_check_interval_minutes")
         
         if check_interval_minutes is None or max_applications_per_day is None:
             raise HTTPException(status_code=400, detail="Отсутствуют обязательные параметры")
         
+        if min_check_interval_minutes is not None or max_check_interval_minutes is not None:
+            current_min, current_max = await auto_apply_service.get_check_interval_bounds(session)
+            min_check_interval_minutes = int(min_check_interval_minutes or current_min)
+            max_check_interval_minutes = int(max_check_interval_minutes or current_max)
+            if not 1 <= min_check_interval_minutes <= max_check_interval_minutes:
+                raise HTTPException(status_code=400, detail="Некорректные границы интервала проверки")
+            
+            await auto_apply_service.update_setting(
+                session,
+                "min_check_interval_minutes",
+                str(min_check_interval_minutes),
+                "Минимальный адаптивный интервал проверки поиска в минутах"
+            )
+            
+            await auto_apply_service.update_setting(
+                session,
+                "max_check_interval_minutes",
+                str(max_check_interval_minutes),
+                "Максимальный адаптивный интервал проверки поиска в минутах"
+            )
+        
         await auto_apply_service.update_setting(
             session, 
             "check_interval_minutes", 
@@ -364,5 +454,7 @@ async def update_system_settings(
         )
         
         return {"message": "Настройки обновлены"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
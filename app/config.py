@@ -5,6 +5,8 @@ from typing import Optional
 class Settings(BaseSettings):
     # Database
     database_url: str = "sqlite+aiosqlite:///./hh_auto_apply.db"
+    database_profile: str = "production"  # Профиль движка: production (WAL, пул соединений) или development
+    database_echo: Optional[bool] = None  # Лог всех SQL запросов (по умолчанию - как в профиле)
     
     # HH.ru OAuth
     hh_client_id: Optional[str] = None
@@ -12,6 +14,47 @@ class Settings(BaseSettings):
     hh_redirect_url: str = "http://localhost:8000/oauth/callback"
     hh_user_agent: str = "HH.ru Auto Apply/1.0 (auto-apply@example.com)"
     
+    # Пул соединений клиента API HH.ru
+    hh_http_max_connections: int = 100  # Максимум одновременных соединений (и запросов)
+    hh_http_max_keepalive_connections: int = 50  # Сколько простаивающих соединений держать открытыми
+    hh_http_keepalive_expiry_seconds: float = 60.0
+    hh_http2: bool = False  # Мультиплексирование HTTP/2, требует пакет h2
+    hh_http_connect_timeout: float = 5.0
+    hh_http_read_timeout: float = 30.0
+    hh_http_write_timeout: float = 10.0
+    hh_http_pool_timeout: float = 10.0  # Максимальное ожидание свободного соединения
+    
+    # Поиск вакансий и кэши
+    hh_search_per_page: int = 100  # Размер страницы при обходе результатов поиска
+    hh_search_page_concurrency: int = 3  # Сколько страниц поиска загружать параллельно
+    search_watermark_overlap_minutes: int = 10  # Перекрытие окна date_from при инкрементальном поиске
+    search_cache_max_size: int = 500  # Максимум страниц результатов поиска в общем кэше
+    vacancy_cache_max_size: int = 5000  # Максимум вакансий в кэше деталей
+    vacancy_cache_ttl_seconds: int = 3600  # Время жизни деталей вакансии в кэше
+    
+    # Лимиты запросов к API HH.ru
+    hh_global_rate_per_second: float = 20.0  # Общий лимит приложения (HH-User-Agent)
+    hh_global_burst: int = 40
+    hh_search_rate_per_second: float = 2.0  # Поисковые запросы на один access token
+    hh_search_burst: int = 5
+    hh_negotiations_rate_per_minute: float = 12.0  # Отклики на один access token
+    hh_negotiations_burst: int = 1
+    hh_rate_limit_penalty_seconds: float = 10.0  # Пауза для токена после ответа 429
+    
+    # Повторы запросов к HH.ru
+    hh_retry_max_attempts: int = 4  # Максимум попыток одного запроса
+    hh_retry_base_delay_seconds: float = 1.0  # Базовая задержка экспоненциального backoff
+    hh_retry_max_delay_seconds: float = 30.0  # Максимальная задержка между попытками
+    
+    hh_oauth_timeout_seconds: float = 30.0  # Таймаут запросов к /token
+    hh_oauth_max_connections: int = 10  # Размер пула соединений OAuth клиента
+    hh_oauth_max_keepalive_connections: int = 5
+    hh_oauth_keepalive_expiry_seconds: float = 30.0
+    token_refresh_margin_minutes: int = 5  # За сколько минут до истечения обновлять access token
+    token_refresh_concurrency: int = 5  # Максимум одновременных обновлений токенов
+    token_refresh_scan_interval_seconds: int = 60  # Период поиска истекающих токенов
+    credentials_cache_ttl_seconds: int = 60  # Сколько секунд учетные данные живут в кэше процесса
+    
     # Security
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
@@ -19,8 +62,38 @@ class Settings(BaseSettings):
     
     # Application settings
     check_interval_minutes: int = 30  # Интервал проверки новых вакансий
+    min_check_interval_minutes: int = 5  # Нижняя граница адаптивного интервала поиска
+    max_check_interval_minutes: int = 1440  # Верхняя граница адаптивного интервала поиска
+    adaptive_yield_alpha: float = 0.3  # Вес последнего прохода в среднем выходе новых вакансий
     max_applications_per_day: int = 50  # Максимум откликов в день
     max_users: int = 100  # Максимум пользователей
+    request_log_batch_size: int = 100  # Размер пачки при записи логов запросов
+    request_log_flush_interval_seconds: float = 2.0  # Максимальная задержка записи логов
+    request_log_max_queue_size: int = 10000  # Размер буфера логов в памяти
+    max_concurrent_users: int = 10  # Максимум пользователей, обрабатываемых параллельно
+    scheduler_claim_batch_size: int = 200  # Сколько поисков воркер забирает за один цикл
+    scheduler_lease_seconds: int = 300  # Срок аренды поиска воркером (продлевается во время работы)
+    scheduler_poll_seconds: int = 15  # Максимальная пауза воркера перед проверкой очереди поисков
+    scheduler_jitter_ratio: float = 0.1  # Случайный разброс времени следующего запуска поиска (доля интервала)
+    user_timeout_seconds: int = 900  # Бюджет времени на обработку одного пользователя за цикл
+    
+    # Очередь откликов
+    apply_queue_claim_batch_size: int = 50  # Сколько откликов воркер забирает из очереди за раз
+    apply_queue_lock_seconds: int = 600  # Через сколько брошенный упавшим воркером отклик вернется в очередь
+    apply_queue_max_attempts: int = 5  # Максимум попыток отправить отклик
+    apply_queue_retry_base_seconds: float = 60.0  # Базовая задержка перед повтором отклика
+    apply_queue_retry_max_seconds: float = 3600.0  # Максимальная задержка перед повтором отклика
+    apply_queue_credentials_wait_seconds: int = 900  # Пауза отклика, если у пользователя нет действующего токена или резюме
+    apply_queue_poll_seconds: int = 5  # Пауза воркера откликов при пустой очереди
+    
+    # Списки в API
+    api_page_size: int = 50  # Размер страницы откликов и логов по умолчанию
+    api_max_page_size: int = 200  # Максимальный размер страницы, который может запросить клиент
+    
+    # Процессы
+    embedded_worker: bool = True  # Выполнять цикл откликов внутри веб-процесса (иначе - python -m app.worker)
+    worker_idle_poll_seconds: int = 15  # Как часто остановленный воркер проверяет, не включили ли отклик
+    web_reload: bool = False  # Автоперезагрузка uvicorn при изменении кода (только для разработки)
     
     class Config:
         env_file = ".env"
@@ -1,18 +1,55 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
+from typing import List
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, JSON
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, Float, String, DateTime, Boolean, Text, ForeignKey, JSON, UniqueConstraint, Index
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 from app.config import settings
 from app.types import UserRole
+from app.utils.db_engine import build_engine, get_engine_profile
 
-# Создаем асинхронный движок базы данных
-engine = create_async_engine(settings.database_url, echo=True)
+# Создаем асинхронный движок базы данных с параметрами выбранного профиля
+engine = build_engine(
+    settings.database_url,
+    get_engine_profile(settings.database_profile, settings.database_echo)
+)
 AsyncSessionLocal = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 Base = declarative_base()
 
 
+class LocalDateTime(TypeDecorator):
+    """Дата и время с часовым поясом, в приложении - наивное локальное время.
+
+    Код сравнивает значения из базы с datetime.now(). SQLite возвращает их
+    без часового пояса, а PostgreSQL (timestamptz) - с поясом UTC, поэтому
+    результат приводится к локальному времени без пояса.
+
+    В SQLite значения хранятся строками с точностью до секунды - в том же
+    формате, что и CURRENT_TIMESTAMP у server_default, иначе сравнение
+    строк "2024-01-01 10:00:00" и "2024-01-01 10:00:00.000000" (например,
+    в курсоре страницы) дает неверный результат.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(sqlite.DATETIME(
+                storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"
+            ))
+        return dialect.type_descriptor(self.impl)
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+
 class User(Base):
     __tablename__ = "users"
     
@@ -22,7 +59,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     role = Column(String, default=UserRole.USER)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(LocalDateTime, server_default=func.now())
     
     # Связи
     job_searches = relationship("JobSearch", back_populates="user")
@@ -33,15 +70,27 @@ class User(Base):
 
 class JobSearch(Base):
     __tablename__ = "job_searches"
+    __table_args__ = (
+        Index("ix_job_searches_active_user", "is_active", "user_id"),
+        # Очередь планировщика: активные поиски по времени следующего запуска
+        Index("ix_job_searches_active_next_run", "is_active", "next_run_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     name = Column(String, nullable=False)
-    search_params = Column(JSON, nullable=False)  # Параметры поиска в JSON
+    search_params = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=False)  # Параметры поиска в JSON
     cover_letter = Column(Text, nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    last_published_at = Column(String, nullable=True)  # Самая свежая published_at среди просмотренных вакансий
+    last_run_at = Column(LocalDateTime, nullable=True)  # Время последнего полного прохода поиска
+    next_run_at = Column(LocalDateTime, nullable=True)  # Когда поиск нужно запустить снова
+    check_interval_minutes = Column(Integer, nullable=True)  # Адаптивный интервал проверки (None - общий)
+    yield_score = Column(Float, nullable=True)  # Среднее число новых вакансий за проход
+    lease_owner = Column(String, nullable=True)  # Воркер, который сейчас обрабатывает поиск
+    lease_expires_at = Column(LocalDateTime, nullable=True)  # До какого времени действует аренда
+    created_at = Column(LocalDateTime, server_default=func.now())
+    updated_at = Column(LocalDateTime, onupdate=func.now())
     
     # Связи
     user = relationship("User", back_populates="job_searches")
@@ -51,6 +100,11 @@ class JobSearch(Base):
 
 class Application(Base):
     __tablename__ = "applications"
+    __table_args__ = (
+        # Один отклик пользователя на вакансию - гарантирует база, а не проверка перед вставкой
+        Index("uq_applications_user_vacancy", "user_id", "vacancy_id", unique=True),
+        Index("ix_applications_user_applied_at", "user_id", "applied_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -58,7 +112,7 @@ class Application(Base):
     vacancy_id = Column(String, nullable=False)
     vacancy_title = Column(String, nullable=False)
     company_name = Column(String, nullable=False)
-    applied_at = Column(DateTime(timezone=True), server_default=func.now())
+    applied_at = Column(LocalDateTime, server_default=func.now())
     status = Column(String, default="pending")  # pending, success, failed
     
     # Связи
@@ -66,16 +120,40 @@ class Application(Base):
     job_search = relationship("JobSearch", back_populates="applications")
 
 
+class ApplyTask(Base):
+    __tablename__ = "apply_queue"
+    __table_args__ = (
+        UniqueConstraint("user_id", "vacancy_id", name="uq_apply_queue_user_vacancy"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    job_search_id = Column(Integer, ForeignKey("job_searches.id"), nullable=False)
+    vacancy_id = Column(String, nullable=False)
+    vacancy_title = Column(String, nullable=False)
+    company_name = Column(String, nullable=False)
+    status = Column(String, default="queued", nullable=False)  # queued, in_progress
+    attempts = Column(Integer, default=0, nullable=False)  # Сколько раз задачу брали в работу
+    next_attempt_at = Column(LocalDateTime, nullable=False, index=True)  # Когда можно пробовать снова
+    locked_by = Column(String, nullable=True)  # Воркер, который отправляет отклик
+    locked_until = Column(LocalDateTime, nullable=True)  # До какого времени задача за ним закреплена
+    last_error = Column(Text, nullable=True)  # Ошибка последней попытки
+    created_at = Column(LocalDateTime, server_default=func.now())
+
+
 class HHUserCredentials(Base):
     __tablename__ = "hh_user_credentials"
+    __table_args__ = (
+        Index("ix_hh_user_credentials_user_created_at", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     access_token = Column(String, nullable=False)
     refresh_token = Column(String, nullable=True)
-    expires_at = Column(DateTime(timezone=True), nullable=True)
+    expires_at = Column(LocalDateTime, nullable=True)
     resume_id = Column(String, nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(LocalDateTime, server_default=func.now())
     
     # Связи
     user = relationship("User", back_populates="hh_credentials")
@@ -83,6 +161,9 @@ class HHUserCredentials(Base):
 
 class RequestLog(Base):
     __tablename__ = "request_logs"
+    __table_args__ = (
+        Index("ix_request_logs_user_created_at", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # null для системных запросов
@@ -91,7 +172,7 @@ class RequestLog(Base):
     status = Column(String, nullable=False)  # success, failed, no_token
     details = Column(Text, nullable=True)  # Детали запроса/ответа
     error_message = Column(Text, nullable=True)  # Сообщение об ошибке
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(LocalDateTime, server_default=func.now())
     
     # Связи
     user = relationship("User", back_populates="request_logs")
@@ -105,7 +186,7 @@ class SystemSettings(Base):
     key = Column(String, unique=True, nullable=False)  # check_interval_minutes, max_applications_per_day
     value = Column(String, nullable=False)  # Значение настройки
     description = Column(Text, nullable=True)  # Описание настройки
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    updated_at = Column(LocalDateTime, server_default=func.now(), onupdate=func.now())
 
 
 class OAuthState(Base):
@@ -114,12 +195,23 @@ class OAuthState(Base):
     id = Column(Integer, primary_key=True, index=True)
     state = Column(String, unique=True, nullable=False, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(LocalDateTime, server_default=func.now())
     
     # Связи
     user = relationship("User")
 
 
+def insert_ignoring_conflicts(model, dialect_name: str, index_elements: List[str]):
+    """INSERT ... ON CONFLICT DO NOTHING для SQLite и PostgreSQL"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"INSERT ... ON CONFLICT не поддерживается для {dialect_name}")
+    return insert(model).on_conflict_do_nothing(index_elements=index_elements)
+
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
@@ -128,6 +220,27 @@ async def get_db():
             await session.close()
 
 
-async def init_db():
+# Ключ advisory-блокировки PostgreSQL, под которой создается и мигрирует схема
+SCHEMA_LOCK_KEY = 4242001
+
+
+def lock_schema(conn):
+    """Блокировка схемы до конца транзакции.
+
+    API и воркеры вызывают init_db при старте одновременно: без блокировки
+    два процесса создают одни и те же таблицы и применяют одну миграцию
+    дважды. В SQLite BEGIN IMMEDIATE сразу берет блокировку записи базы.
+    """
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+    elif conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+async def init_db() -> List[int]:
+    """Создание таблиц и применение миграций. Возвращает версии примененных миграций"""
+    from app.migrations import run_migrations
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all) 
\ No newline at end of file
+        await conn.run_sync(lock_schema)
+        await conn.run_sync(Base.metadata.create_all)
+        return await conn.run_sync(run_migrations)
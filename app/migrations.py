@@ -0,0 +1,112 @@
+"""Версионированные миграции схемы базы данных.
+
+Новые базы создаются сразу по моделям (Base.metadata.create_all), а
+миграции доводят существующие базы до текущей схемы. Каждая миграция
+идемпотентна и выполняется один раз - номер примененной версии
+записывается в таблицу schema_migrations. SQL в миграциях должен работать
+и в SQLite, и в PostgreSQL: типы колонок компилируются для диалекта
+подключения, а индексы создаются по описанию в моделях.
+"""
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, Table, inspect, text
+from sqlalchemy.engine import Connection
+
+from app.database import Application, HHUserCredentials, JobSearch, RequestLog
+
+
+def _add_column(conn: Connection, column: Column):
+    """Добавление колонки модели в существующую таблицу, если ее еще нет"""
+    table = column.table.name
+    existing = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column.name in existing:
+        return
+    column_type = column.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column.name} {column_type}"))
+
+
+def _create_index(conn: Connection, table: Table, name: str):
+    """Создание объявленного в модели индекса, если его еще нет"""
+    index = next(index for index in table.indexes if index.name == name)
+    index.create(conn, checkfirst=True)
+
+
+def _job_search_watermark(conn: Connection):
+    _add_column(conn, JobSearch.__table__.c.last_published_at)
+    _add_column(conn, JobSearch.__table__.c.last_run_at)
+
+
+def _job_search_leases(conn: Connection):
+    _add_column(conn, JobSearch.__table__.c.next_run_at)
+    _add_column(conn, JobSearch.__table__.c.lease_owner)
+    _add_column(conn, JobSearch.__table__.c.lease_expires_at)
+
+
+def _job_search_next_run_index(conn: Connection):
+    # Индекса уже нет в модели (заменен составным в миграции 6), поэтому SQL задан явно
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_job_searches_next_run_at ON job_searches (next_run_at)"))
+
+
+def _job_search_adaptive_interval(conn: Connection):
+    _add_column(conn, JobSearch.__table__.c.check_interval_minutes)
+    _add_column(conn, JobSearch.__table__.c.yield_score)
+
+
+def _applications_unique_vacancy(conn: Connection):
+    # Из дублей оставляем успешный отклик, а среди равных - самый ранний
+    conn.execute(text(
+        "DELETE FROM applications WHERE status <> 'success' AND EXISTS ("
+        "SELECT 1 FROM applications AS best "
+        "WHERE best.user_id = applications.user_id "
+        "AND best.vacancy_id = applications.vacancy_id "
+        "AND best.status = 'success')"
+    ))
+    conn.execute(text(
+        "DELETE FROM applications WHERE id NOT IN ("
+        "SELECT MIN(id) FROM applications GROUP BY user_id, vacancy_id)"
+    ))
+    _create_index(conn, Application.__table__, "uq_applications_user_vacancy")
+
+
+def _hot_path_indexes(conn: Connection):
+    # CREATE INDEX не блокирует чтение, поэтому миграцию можно применять на работающей базе
+    _create_index(conn, Application.__table__, "ix_applications_user_applied_at")
+    _create_index(conn, RequestLog.__table__, "ix_request_logs_user_created_at")
+    _create_index(conn, HHUserCredentials.__table__, "ix_hh_user_credentials_user_created_at")
+    _create_index(conn, JobSearch.__table__, "ix_job_searches_active_user")
+    _create_index(conn, JobSearch.__table__, "ix_job_searches_active_next_run")
+    conn.execute(text("DROP INDEX IF EXISTS ix_job_searches_next_run_at"))
+
+
+# (версия, описание, функция миграции) - только добавлять в конец
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Водяной знак поиска работы (last_published_at, last_run_at)", _job_search_watermark),
+    (2, "Аренда поисков работы воркерами (next_run_at, lease_owner, lease_expires_at)", _job_search_leases),
+    (3, "Индекс очереди поисков по next_run_at", _job_search_next_run_index),
+    (4, "Адаптивный интервал проверки поиска (check_interval_minutes, yield_score)", _job_search_adaptive_interval),
+    (5, "Уникальный отклик пользователя на вакансию (applications.user_id, vacancy_id)", _applications_unique_vacancy),
+    (6, "Составные индексы для частых запросов (отклики, логи, учетные данные, поиски)", _hot_path_indexes),
+]
+
+
+def run_migrations(conn: Connection) -> List[int]:
+    """Применение всех еще не примененных миграций. Возвращает их версии"""
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "version INTEGER PRIMARY KEY, "
+        "description VARCHAR NOT NULL, "
+        "applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    newly_applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version in applied:
+            continue
+        migrate(conn)
+        conn.execute(
+            text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+            {"version": version, "description": description}
+        )
+        newly_applied.append(version)
+    return newly_applied
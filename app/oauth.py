@@ -3,16 +3,18 @@ from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.database import get_db, OAuthState, HHUserCredentials, User
 from app.utils.auth import get_current_user
-from app.utils.hh_oauth import HHOAuthClient
+from app.utils.hh_oauth import hh_oauth_client
 from app.config import settings
+from app.utils.credentials import credentials_cache, token_expires_at
+from app.utils.token_refresher import token_refresher
 from sqlalchemy import select
 from datetime import datetime, timedelta
 import secrets
 
 router = APIRouter(prefix="/oauth", tags=["oauth"])
 
-# Создаем OAuth клиент
-oauth_client = HHOAuthClient()
+# Общий OAuth клиент с пулом соединений
+oauth_client = hh_oauth_client
 
 @router.get("/authorize")
 async def authorize(
@@ -75,7 +77,7 @@ async def callback(
             user_id=user_id,
             access_token=user_auth.access_token,
             refresh_token=user_auth.refresh_token,
-            expires_at=datetime.fromtimestamp(user_auth.expires_at) if user_auth.expires_at else None
+            expires_at=token_expires_at(user_auth)
         )
         
         session.add(credentials)
@@ -84,6 +86,7 @@ async def callback(
         await session.delete(oauth_state)
         
         await session.commit()
+        credentials_cache.invalidate(user_id)
         
         # Перенаправляем на главную страницу
         return RedirectResponse(url="/?oauth_success=true")
@@ -98,28 +101,12 @@ async def refresh_token(
 ):
     """Обновление access token"""
     try:
-        # Получаем текущие credentials пользователя
-        result = await session.execute(
-            select(HHUserCredentials).where(
-                HHUserCredentials.user_id == current_user_id
-            ).order_by(HHUserCredentials.created_at.desc()).limit(1)
-        )
-        credentials = result.scalar_one_or_none()
+        # Обновление идет через общий планировщик, чтобы не пересечься с фоновым
+        credentials = await token_refresher.refresh_user(current_user_id, force=True)
         
-        if not credentials or not credentials.refresh_token:
+        if not credentials:
             raise HTTPException(status_code=400, detail="Нет refresh token для обновления")
         
-        # Обновляем токен
-        new_auth = await oauth_client.refresh_tokens(credentials.refresh_token)
-        
-        # Обновляем credentials в базе
-        credentials.access_token = new_auth.access_token
-        if new_auth.refresh_token:
-            credentials.refresh_token = new_auth.refresh_token
-        credentials.expires_at = datetime.fromtimestamp(new_auth.expires_at) if new_auth.expires_at else None
-        
-        await session.commit()
-        
         return {"message": "Токен успешно обновлен"}
         
     except Exception as e:
@@ -143,19 +130,17 @@ async def revoke_token(
         if not credentials_list:
             raise HTTPException(status_code=400, detail="Нет активных токенов")
         
-        # Отзываем токены через API HH.ru
-        for credentials in credentials_list:
-            if credentials.access_token:
-                try:
-                    await oauth_client.revoke_token(credentials.access_token)
-                except:
-                    pass  # Игнорируем ошибки отзыва
+        # Отзываем токены через API HH.ru параллельно, ошибки отзыва игнорируются
+        await oauth_client.revoke_tokens([
+            credentials.access_token for credentials in credentials_list if credentials.access_token
+        ])
         
         # Удаляем credentials из базы
         for credentials in credentials_list:
             await session.delete(credentials)
         
         await session.commit()
+        credentials_cache.invalidate(current_user_id)
         
         return {"message": "Токены успешно отозваны"}
         
@@ -170,12 +155,7 @@ async def get_oauth_status(
     """Получение статуса OAuth подключения"""
     try:
         # Получаем последние credentials пользователя
-        result = await session.execute(
-            select(HHUserCredentials).where(
-                HHUserCredentials.user_id == current_user_id
-            ).order_by(HHUserCredentials.created_at.desc()).limit(1)
-        )
-        credentials = result.scalar_one_or_none()
+        credentials = await credentials_cache.get(session, current_user_id)
         
         if not credentials:
             return {
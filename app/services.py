@@ -1,18 +1,70 @@
 import asyncio
-from typing import List, Optional
+from typing import List, Optional, Set, Dict, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
-from datetime import datetime, timedelta
-from app.database import JobSearch, Application, RequestLog, SystemSettings
-from app.types import JobSearchCreate, HHApplicationRequest
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.sql import Select
+from datetime import datetime, timedelta, date, time
+from app.database import JobSearch, Application, ApplyTask, RequestLog, SystemSettings, HHUserCredentials
+from app.types import JobSearchCreate, HHApplicationRequest, HHVacancySearchParams
 from app.config import settings
-from app.database import AsyncSessionLocal
+from app.database import AsyncSessionLocal, insert_ignoring_conflicts
+from app.utils.leases import JobSearchLeases, jittered_run_at, make_worker_id
+from app.utils.apply_queue import ApplyQueue
+from app.utils.pagination import keyset_query, keyset_result
+
+
+class DailyApplicationCounter:
+    """Счетчик откликов пользователей за текущие сутки.
+    
+    Значение для пользователя один раз за цикл заполняется запросом COUNT
+    (успешные отклики плюс стоящие в очереди), после чего увеличивается
+    в памяти на каждую поставленную в очередь вакансию.
+    """
+    
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self._day = date.today()
+        self._counts: Dict[int, int] = {}
+    
+    def reset(self, limit: int):
+        """Сброс счетчиков в начале цикла с актуальным лимитом из настроек"""
+        self.limit = limit
+        self._day = date.today()
+        self._counts.clear()
+    
+    def is_seeded(self, user_id: int) -> bool:
+        # С наступлением новых суток счетчики обнуляются
+        if self._day != date.today():
+            self._day = date.today()
+            self._counts.clear()
+        return user_id in self._counts
+    
+    def seed(self, user_id: int, count: int):
+        self._counts[user_id] = count
+    
+    def increment(self, user_id: int):
+        self._counts[user_id] = self._counts.get(user_id, 0) + 1
+    
+    def is_exhausted(self, user_id: int) -> bool:
+        limit = self.limit if self.limit is not None else settings.max_applications_per_day
+        return self._counts.get(user_id, 0) >= limit
 
 
 class AutoApplyService:
     def __init__(self):
         self.is_running = False
         self.task = None
+        self.apply_loop_task = None
+        self.daily_counter = DailyApplicationCounter()
+        self.worker_id = make_worker_id()
+        self.leases = JobSearchLeases(self.worker_id, settings.scheduler_lease_seconds)
+        self.apply_queue = ApplyQueue(
+            self.worker_id,
+            lock_seconds=settings.apply_queue_lock_seconds,
+            max_attempts=settings.apply_queue_max_attempts,
+            retry_base_seconds=settings.apply_queue_retry_base_seconds,
+            retry_max_seconds=settings.apply_queue_retry_max_seconds
+        )
     
     async def create_job_search(self, session: AsyncSession, job_data: JobSearchCreate, user_id: int) -> JobSearch:
         """Создание нового поиска работы"""
@@ -23,70 +75,139 @@ class AutoApplyService:
             name=job_data.name,
             search_params=job_data.search_params.dict(),
             cover_letter=job_data.cover_letter,
-            is_active=True
+            is_active=True,
+            # Первый запуск - в ближайшие минуты, но не одновременно со всеми новыми поисками
+            next_run_at=jittered_run_at(settings.scheduler_poll_seconds, 1.0)
         )
         session.add(job_search)
         await session.commit()
         await session.refresh(job_search)
         return job_search
     
+    def job_searches_query(self, user_id: int) -> Select:
+        """Запрос активных поисков работы пользователя"""
+        return select(JobSearch).where(
+            JobSearch.is_active == True,
+            JobSearch.user_id == user_id
+        )
+    
     async def get_job_searches(self, session: AsyncSession, user_id: int) -> List[JobSearch]:
         """Получение активных поисков работы пользователя"""
-        from app.database import JobSearch
-        result = await session.execute(
-            select(JobSearch).where(
-                JobSearch.is_active == True,
-                JobSearch.user_id == user_id
-            )
-        )
+        result = await session.execute(self.job_searches_query(user_id))
         return result.scalars().all()
     
-    async def get_applications(self, session: AsyncSession, user_id: int, job_search_id: Optional[int] = None) -> List[Application]:
-        """Получение откликов пользователя"""
-        from app.database import Application
+    def applications_query(
+        self,
+        user_id: int,
+        job_search_id: Optional[int] = None,
+        status: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Select:
+        """Запрос страницы откликов пользователя от новых к старым"""
         query = select(Application).where(Application.user_id == user_id)
         if job_search_id:
             query = query.where(Application.job_search_id == job_search_id)
-        query = query.order_by(Application.applied_at.desc())
+        if status:
+            query = query.where(Application.status == status)
+        if date_from:
+            query = query.where(Application.applied_at >= date_from)
+        if date_to:
+            query = query.where(Application.applied_at < date_to)
         
-        result = await session.execute(query)
-        return result.scalars().all()
+        return keyset_query(query, Application.applied_at, Application.id, cursor, limit)
     
-
+    async def get_applications(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        job_search_id: Optional[int] = None,
+        status: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Tuple[List[Application], Optional[str]]:
+        """Страница откликов пользователя от новых к старым и курсор следующей страницы"""
+        result = await session.execute(
+            self.applications_query(user_id, job_search_id, status, date_from, date_to, cursor, limit)
+        )
+        return keyset_result(result.scalars().all(), Application.applied_at, Application.id, limit)
     
-    async def check_already_applied(self, session: AsyncSession, vacancy_id: str, user_id: int) -> bool:
-        """Проверка, был ли уже отклик на эту вакансию"""
-        from app.database import Application
+    async def get_application_stats(self, session: AsyncSession, user_id: int) -> Dict[str, int]:
+        """Число откликов пользователя по статусам"""
         result = await session.execute(
-            select(Application).where(
-                Application.vacancy_id == vacancy_id,
-                Application.user_id == user_id
-            )
+            select(Application.status, func.count(Application.id))
+            .where(Application.user_id == user_id)
+            .group_by(Application.status)
         )
-        return result.scalar_one_or_none() is not None
+        counts = {str(status): count for status, count in result.all()}
+        counts["total"] = sum(counts.values())
+        return counts
     
-    async def save_application(self, session: AsyncSession, job_search_id: int, user_id: int, vacancy_id: str, 
-                             vacancy_title: str, company_name: str, status: str = "pending") -> Application:
-        """Сохранение отклика в базу данных"""
-        from app.database import Application
-        application = Application(
-            user_id=user_id,
-            job_search_id=job_search_id,
-            vacancy_id=vacancy_id,
-            vacancy_title=vacancy_title,
-            company_name=company_name,
-            status=status
+    def request_logs_query(
+        self,
+        user_id: int,
+        request_type: Optional[str] = None,
+        status: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Select:
+        """Запрос страницы логов запросов пользователя от новых к старым"""
+        query = select(RequestLog).where(RequestLog.user_id == user_id)
+        if request_type:
+            query = query.where(RequestLog.request_type == request_type)
+        if status:
+            query = query.where(RequestLog.status == status)
+        if date_from:
+            query = query.where(RequestLog.created_at >= date_from)
+        if date_to:
+            query = query.where(RequestLog.created_at < date_to)
+        
+        return keyset_query(query, RequestLog.created_at, RequestLog.id, cursor, limit)
+    
+    async def get_request_logs(
+        self,
+        session: AsyncSession,
+        user_id: int,
+        request_type: Optional[str] = None,
+        status: Optional[str] = None,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50
+    ) -> Tuple[List[RequestLog], Optional[str]]:
+        """Страница логов запросов пользователя от новых к старым и курсор следующей страницы"""
+        result = await session.execute(
+            self.request_logs_query(user_id, request_type, status, date_from, date_to, cursor, limit)
         )
-        session.add(application)
-        await session.commit()
-        await session.refresh(application)
-        return application
+        return keyset_result(result.scalars().all(), RequestLog.created_at, RequestLog.id, limit)
+    
 
+    
+    def applied_vacancy_ids_query(self, user_id: int, vacancy_ids: List[str]) -> Select:
+        """Запрос вакансий из списка, на которые уже был отклик"""
+        return select(Application.vacancy_id).where(
+            Application.user_id == user_id,
+            Application.vacancy_id.in_(vacancy_ids)
+        )
+    
+    async def get_applied_vacancy_ids(self, session: AsyncSession, user_id: int, vacancy_ids: List[str]) -> Set[str]:
+        """Получение вакансий из списка, на которые уже был отклик, одним запросом"""
+        if not vacancy_ids:
+            return set()
+        result = await session.execute(self.applied_vacancy_ids_query(user_id, vacancy_ids))
+        return set(result.scalars().all())
+    
     async def log_request(self, session: AsyncSession, request_type: str, status: str, 
                          user_id: int = None, job_search_id: int = None, details: str = None, error_message: str = None):
-        """Логирование запросов к API"""
-        from app.database import RequestLog
-        log_entry = RequestLog(
+        """Логирование запросов к API (запись в базу выполняется в фоне пачками)"""
+        from app.utils.request_log import request_log_writer
+        request_log_writer.enqueue(
             user_id=user_id,
             job_search_id=job_search_id,
             request_type=request_type,
@@ -94,8 +215,6 @@ class AutoApplyService:
             details=details,
             error_message=error_message
         )
-        session.add(log_entry)
-        await session.commit()
 
     async def get_setting(self, session: AsyncSession, key: str, default_value: str) -> str:
         """Получение настройки системы"""
@@ -125,29 +244,306 @@ class AutoApplyService:
             session.add(setting)
         
         await session.commit()
+        
+        if key == "max_applications_per_day":
+            self.daily_counter.limit = int(value)
 
     async def get_check_interval(self, session: AsyncSession) -> int:
         """Получение интервала проверки в минутах"""
         interval_str = await self.get_setting(session, "check_interval_minutes", str(settings.check_interval_minutes))
         return int(interval_str)
 
+    async def get_check_interval_bounds(self, session: AsyncSession) -> Tuple[int, int]:
+        """Границы адаптивного интервала проверки поиска в минутах"""
+        min_interval = await self.get_setting(session, "min_check_interval_minutes", str(settings.min_check_interval_minutes))
+        max_interval = await self.get_setting(session, "max_check_interval_minutes", str(settings.max_check_interval_minutes))
+        return int(min_interval), int(max_interval)
+    
+    async def adapt_check_interval(self, session: AsyncSession, job_search: JobSearch, new_vacancies: int):
+        """Пересчет интервала проверки поиска по числу новых вакансий в последнем проходе"""
+        from app.utils.adaptive import update_yield, adapt_interval
+        
+        min_interval, max_interval = await self.get_check_interval_bounds(session)
+        current = job_search.check_interval_minutes or await self.get_check_interval(session)
+        job_search.yield_score = update_yield(job_search.yield_score, new_vacancies, settings.adaptive_yield_alpha)
+        job_search.check_interval_minutes = adapt_interval(current, job_search.yield_score, min_interval, max_interval)
+    
+    async def is_auto_apply_enabled(self, session: AsyncSession) -> bool:
+        """Включен ли автоматический отклик (общий флаг для веб-процесса и воркеров)"""
+        return await self.get_setting(session, "auto_apply_enabled", "false") == "true"
+    
+    async def set_auto_apply_enabled(self, session: AsyncSession, enabled: bool):
+        """Включение или выключение автоматического отклика для всех воркеров"""
+        await self.update_setting(
+            session, "auto_apply_enabled", "true" if enabled else "false",
+            "Автоматический отклик включен"
+        )
+    
+    async def enqueue_user_searches(self, session: AsyncSession, user_id: int) -> int:
+        """Постановка активных поисков пользователя в очередь на ближайший цикл воркера"""
+        result = await session.execute(
+            update(JobSearch).where(
+                JobSearch.user_id == user_id,
+                JobSearch.is_active == True
+            ).values(next_run_at=datetime.now()).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        return result.rowcount
+    
     async def get_max_applications_per_day(self, session: AsyncSession) -> int:
         """Получение максимального количества откликов в день"""
         max_app_str = await self.get_setting(session, "max_applications_per_day", str(settings.max_applications_per_day))
         return int(max_app_str)
     
-    async def process_job_search(self, session: AsyncSession, job_search: JobSearch) -> int:
-        """Обработка одного поиска работы - поиск и отклик на вакансии"""
-        applied_count = 0
+    def today_applications_query(self, user_id: int) -> Select:
+        """Запрос количества успешных откликов пользователя за сегодня"""
+        return select(func.count(Application.id)).where(
+            Application.user_id == user_id,
+            Application.applied_at >= datetime.combine(date.today(), time.min),
+            Application.status == "success"
+        )
+    
+    async def count_today_applications(self, session: AsyncSession, user_id: int) -> int:
+        """Количество успешных откликов пользователя за сегодня"""
+        result = await session.execute(self.today_applications_query(user_id))
+        return result.scalar_one()
+    
+    async def ensure_daily_counter(self, session: AsyncSession, user_id: int):
+        """Заполнение счетчика откликов пользователя, если в этом цикле он еще не заполнен"""
+        if self.daily_counter.limit is None:
+            self.daily_counter.limit = await self.get_max_applications_per_day(session)
+        if not self.daily_counter.is_seeded(user_id):
+            # Отклики из очереди тоже расходуют дневной лимит
+            self.daily_counter.seed(
+                user_id,
+                await self.count_today_applications(session, user_id)
+                + await self.apply_queue.count_pending(session, user_id)
+            )
+    
+    async def claim_vacancy(self, session: AsyncSession, task: ApplyTask) -> bool:
+        """Атомарное резервирование вакансии за пользователем до отправки отклика.
+        
+        Вставляет отклик со статусом pending, конфликт по уникальному индексу
+        (user_id, vacancy_id) означает, что вакансия уже занята. Незавершенная
+        запись pending может остаться только от прошлой попытки этой же задачи
+        (задача в очереди уникальна и заблокирована за воркером) - ее продолжаем.
+        """
+        result = await session.execute(
+            insert_ignoring_conflicts(Application, session.bind.dialect.name, ["user_id", "vacancy_id"]).values(
+                user_id=task.user_id,
+                job_search_id=task.job_search_id,
+                vacancy_id=task.vacancy_id,
+                vacancy_title=task.vacancy_title,
+                company_name=task.company_name,
+                status="pending"
+            )
+        )
+        if result.rowcount == 1:
+            return True
         
-        # Получаем access token пользователя
-        from app.database import HHUserCredentials
         result = await session.execute(
-            select(HHUserCredentials).where(
-                HHUserCredentials.user_id == job_search.user_id
-            ).order_by(HHUserCredentials.created_at.desc()).limit(1)
+            select(Application.status).where(
+                Application.user_id == task.user_id,
+                Application.vacancy_id == task.vacancy_id
+            )
+        )
+        return result.scalar_one_or_none() == "pending"
+    
+    async def finish_application(self, session: AsyncSession, task: ApplyTask, status: str):
+        """Запись результата зарезервированного отклика"""
+        # Время пишется из приложения, а не func.now(): в SQLite CURRENT_TIMESTAMP -
+        # это UTC, а дневной лимит считается от локальной полуночи
+        await session.execute(
+            update(Application).where(
+                Application.user_id == task.user_id,
+                Application.vacancy_id == task.vacancy_id
+            ).values(status=status, applied_at=datetime.now()).execution_options(synchronize_session=False)
+        )
+    
+    async def release_vacancy(self, session: AsyncSession, task: ApplyTask):
+        """Снятие резерва вакансии, если отклик так и не был отправлен"""
+        await session.execute(
+            delete(Application).where(
+                Application.user_id == task.user_id,
+                Application.vacancy_id == task.vacancy_id,
+                Application.status == "pending"
+            ).execution_options(synchronize_session=False)
+        )
+    
+    def credentials_error(self, credentials: Optional[HHUserCredentials]) -> Optional[str]:
+        """Причина, по которой с этими учетными данными нельзя откликнуться (None - можно)"""
+        if not credentials or not credentials.access_token or not credentials.resume_id:
+            return "Нет валидного access token или резюме"
+        if credentials.expires_at and credentials.expires_at <= datetime.now():
+            return "Токен истек"
+        return None
+    
+    async def postpone_for_credentials(self, session: AsyncSession, task: ApplyTask, reason: str):
+        """Отклик откладывается без расхода попытки: ошибка в учетных данных, а не в вакансии"""
+        print(f"Отклик на вакансию {task.vacancy_id} отложен: {reason}")
+        await self.apply_queue.postpone(
+            session, task, datetime.now() + timedelta(seconds=settings.apply_queue_credentials_wait_seconds), reason
+        )
+        await session.commit()
+    
+    def is_accepted_earlier(self, error: Exception, task: ApplyTask) -> bool:
+        """Отказ already_applied при повторе означает, что прошлая попытка дошла до HH.ru.
+        
+        Таймаут, обрыв соединения или 5xx на POST /negotiations не говорят,
+        принят ли отклик. Вакансия зарезервирована за задачей (claim_vacancy),
+        поэтому другого нашего отклика на нее быть не может.
+        """
+        from app.utils.hh_api import HHAPIError
+        return isinstance(error, HHAPIError) and error.has_error("already_applied") and task.attempts > 1
+    
+    async def handle_application_error(self, session: AsyncSession, task: ApplyTask, e: Exception) -> bool:
+        """Повтор, откладывание или окончательный отказ по ошибке отправки отклика"""
+        import httpx
+        from app.utils.hh_api import HHAPIError
+        
+        print(f"Ошибка отклика на вакансию {task.vacancy_id}: {e}")
+        
+        # HH.ru не принял токен (истек или отозван раньше срока)
+        if isinstance(e, HHAPIError) and e.is_auth_error:
+            await self.postpone_for_credentials(session, task, str(e))
+            return False
+        
+        # Сетевые ошибки, лимиты и сбои HH.ru повторяем позже, отказ по существу и
+        # прочие исключения - окончательно. Повтор после таймаута безопасен: если
+        # первый запрос дошел, HH.ru ответит already_applied (см. is_accepted_earlier)
+        retryable = isinstance(e, httpx.TransportError) or (isinstance(e, HHAPIError) and e.is_retryable)
+        if retryable and self.apply_queue.can_retry(task):
+            await self.apply_queue.retry_later(session, task, str(e))
+            await session.commit()
+            await self.log_request(
+                session,
+                "apply_vacancy",
+                "retry",
+                user_id=task.user_id,
+                job_search_id=task.job_search_id,
+                details=f"Вакансия: {task.vacancy_title}, попытка {task.attempts}",
+                error_message=str(e)
+            )
+            return False
+        
+        # Логируем ошибку отклика
+        await self.log_request(
+            session,
+            "apply_vacancy",
+            "failed",
+            user_id=task.user_id,
+            job_search_id=task.job_search_id,
+            details=f"Вакансия: {task.vacancy_title}",
+            error_message=str(e)
+        )
+        
+        await self.finish_application(session, task, "failed")
+        await self.apply_queue.complete(session, task)
+        await session.commit()
+        return False
+    
+    async def send_application(self, session: AsyncSession, task: ApplyTask, job_search: Optional[JobSearch],
+                               credentials: Optional[HHUserCredentials]) -> bool:
+        """Отправка одного отклика из очереди с логированием и сохранением результата"""
+        from app.utils.hh_api import hh_api_client
+        
+        # Поиск удалили или выключили, пока отклик ждал в очереди
+        if job_search is None or not job_search.is_active:
+            await self.release_vacancy(session, task)
+            await self.apply_queue.complete(session, task)
+            await session.commit()
+            return False
+        
+        # Дневной лимит проверяем по базе: поиски одного пользователя могут ставить
+        # отклики в очередь из разных воркеров, у каждого из которых свой счетчик
+        if await self.count_today_applications(session, task.user_id) >= await self.get_max_applications_per_day(session):
+            print(f"Дневной лимит откликов пользователя {task.user_id} исчерпан, отклик отложен до завтра")
+            await self.apply_queue.postpone(
+                session, task, datetime.combine(date.today() + timedelta(days=1), time.min),
+                "Дневной лимит откликов исчерпан"
+            )
+            await session.commit()
+            return False
+        
+        # Без действующего токена или резюме отказ не связан с вакансией: ждем, пока
+        # токен обновится или пользователь сохранит новые учетные данные
+        credentials_error = self.credentials_error(credentials)
+        if credentials_error:
+            await self.postpone_for_credentials(session, task, credentials_error)
+            return False
+        
+        # Резервируем вакансию до запроса к HH.ru: параллельный воркер второй отклик уже не отправит
+        if not await self.claim_vacancy(session, task):
+            print(f"Отклик на вакансию {task.vacancy_id} уже был отправлен")
+            await self.apply_queue.complete(session, task)
+            await session.commit()
+            return False
+        await session.commit()
+        
+        try:
+            # Создаем отклик
+            application_request = HHApplicationRequest(
+                resume_id=credentials.resume_id,
+                vacancy_id=task.vacancy_id,
+                message=job_search.cover_letter
+            )
+            
+            # Отправляем отклик (паузу между откликами выдерживает ограничитель запросов)
+            await hh_api_client.apply_to_vacancy(application_request, credentials.access_token)
+            
+        except Exception as e:
+            if not self.is_accepted_earlier(e, task):
+                return await self.handle_application_error(session, task, e)
+            print(f"Отклик на вакансию {task.vacancy_id} был принят HH.ru при прошлой попытке")
+        
+        # Логируем успешный отклик
+        await self.log_request(
+            session,
+            "apply_vacancy",
+            "success",
+            user_id=task.user_id,
+            job_search_id=task.job_search_id,
+            details=f"Вакансия: {task.vacancy_title}, Компания: {task.company_name}"
         )
-        credentials = result.scalar_one_or_none()
+        
+        # Результат отклика и удаление задачи - одной транзакцией
+        await self.finish_application(session, task, "success")
+        await self.apply_queue.complete(session, task)
+        await session.commit()
+        
+        print(f"Успешно откликнулись на вакансию: {task.vacancy_title}")
+        return True
+    
+    def build_search_params(self, job_search: JobSearch) -> HHVacancySearchParams:
+        """Параметры поиска с date_from от водяного знака предыдущего прохода"""
+        from app.utils.hh_api import parse_hh_datetime
+        search_params = HHVacancySearchParams(**job_search.search_params)
+        
+        watermark = parse_hh_datetime(job_search.last_published_at)
+        if watermark is None:
+            return search_params
+        
+        # Перекрытие ловит вакансии, опубликованные с задержкой индексации,
+        # а округление до часа дает одинаковым поискам общий ключ кэша
+        date_from = watermark - timedelta(minutes=settings.search_watermark_overlap_minutes)
+        date_from = date_from.replace(minute=0, second=0, microsecond=0)
+        
+        user_date_from = parse_hh_datetime(search_params.date_from)
+        if user_date_from is not None:
+            if user_date_from.tzinfo is None:
+                user_date_from = user_date_from.replace(tzinfo=date_from.tzinfo)
+            if user_date_from >= date_from:
+                return search_params
+        
+        return search_params.copy(update={"date_from": date_from.isoformat(), "period": None})
+    
+    async def process_job_search(self, session: AsyncSession, job_search: JobSearch) -> int:
+        """Обработка одного поиска работы - поиск вакансий и постановка их в очередь откликов"""
+        queued_count = 0
+        
+        # Получаем access token пользователя
+        from app.utils.credentials import credentials_cache
+        credentials = await credentials_cache.get(session, job_search.user_id)
         
         if not credentials or not credentials.access_token:
             print(f"Нет валидного access token для пользователя {job_search.user_id}")
@@ -161,7 +557,14 @@ class AutoApplyService:
             )
             return 0
         
-        # Проверяем, не истек ли токен
+        # Истекший токен пробуем обновить, прежде чем пропускать пользователя
+        if credentials.expires_at and credentials.expires_at <= datetime.now():
+            from app.utils.token_refresher import token_refresher
+            try:
+                credentials = await token_refresher.refresh_user(job_search.user_id) or credentials
+            except Exception as e:
+                print(f"Не удалось обновить токен пользователя {job_search.user_id}: {e}")
+        
         if credentials.expires_at and credentials.expires_at <= datetime.now():
             print(f"Токен истек для пользователя {job_search.user_id}")
             await self.log_request(
@@ -179,13 +582,72 @@ class AutoApplyService:
             return 0
         
         try:
-            # Ищем вакансии используя новые параметры API
-            from app.utils.hh_api import hh_api_client
-            vacancies_response = await hh_api_client.search_vacancies(
-                job_search.search_params, 
-                credentials.access_token
+            await self.ensure_daily_counter(session, job_search.user_id)
+            def limit_reached() -> bool:
+                return self.daily_counter.is_exhausted(job_search.user_id)
+            
+            if limit_reached():
+                print(f"Достигнут лимит откликов в день для пользователя {job_search.user_id}: {self.daily_counter.limit}")
+                return 0
+            
+            # Потоково обходим страницы результатов, начиная с водяного знака прошлого прохода
+            from app.utils.hh_api import hh_api_client, parse_hh_datetime
+            pages = hh_api_client.iter_vacancy_pages(
+                self.build_search_params(job_search),
+                credentials.access_token,
+                should_stop=limit_reached
             )
             
+            seen_count = 0
+            new_count = 0
+            newest_published = parse_hh_datetime(job_search.last_published_at)
+            try:
+                async for page in pages:
+                    seen_count += len(page.items)
+                    
+                    for vacancy in page.items:
+                        published_at = parse_hh_datetime(vacancy.published_at)
+                        if published_at and (newest_published is None or published_at > newest_published):
+                            newest_published = published_at
+                    
+                    # Отсеиваем вакансии страницы, на которые уже откликались или которые уже в очереди
+                    page_ids = [vacancy.id for vacancy in page.items]
+                    applied_ids = await self.get_applied_vacancy_ids(session, job_search.user_id, page_ids)
+                    applied_ids |= await self.apply_queue.queued_vacancy_ids(session, job_search.user_id, page_ids)
+                    
+                    for vacancy in page.items:
+                        if vacancy.id in applied_ids:
+                            continue
+                        applied_ids.add(vacancy.id)
+                        new_count += 1
+                        
+                        # Проверяем лимит откликов в день для пользователя
+                        if limit_reached():
+                            print(f"Достигнут лимит откликов в день для пользователя {job_search.user_id}: {self.daily_counter.limit}")
+                            break
+                        
+                        # Вакансию мог только что поставить в очередь другой воркер
+                        if await self.apply_queue.enqueue(session, job_search, vacancy):
+                            self.daily_counter.increment(job_search.user_id)
+                            queued_count += 1
+                    
+                    # Вакансии страницы попадают в очередь одной транзакцией
+                    await session.commit()
+                    
+                    if limit_reached():
+                        break
+            finally:
+                await pages.aclose()
+            
+            # Водяной знак и интервал меняются только после полного прохода,
+            # иначе непросмотренные из-за лимита вакансии выпали бы из следующих поисков
+            if not limit_reached():
+                if newest_published is not None:
+                    job_search.last_published_at = newest_published.strftime("%Y-%m-%dT%H:%M:%S%z")
+                await self.adapt_check_interval(session, job_search, new_count)
+            job_search.last_run_at = datetime.now()
+            await session.commit()
+            
             # Логируем успешный поиск
             await self.log_request(
                 session,
@@ -193,149 +655,239 @@ class AutoApplyService:
                 "success",
                 user_id=job_search.user_id,
                 job_search_id=job_search.id,
-                details=f"Найдено вакансий: {len(vacancies_response.items)}, Поиск: {job_search.name}"
+                details=(
+                    f"Просмотрено вакансий: {seen_count}, новых: {new_count}, в очередь: {queued_count}, "
+                    f"интервал: {job_search.check_interval_minutes or 'общий'} мин, Поиск: {job_search.name}"
+                )
             )
-            
-            for vacancy in vacancies_response.items:
-                # Проверяем, не откликались ли уже
-                if await self.check_already_applied(session, vacancy.id, job_search.user_id):
-                    continue
-                
-                # Проверяем лимит откликов в день для пользователя
-                today_applications = await session.execute(
-                    select(Application).where(
-                        and_(
-                            Application.user_id == job_search.user_id,
-                            Application.applied_at >= datetime.now().date(),
-                            Application.status == "success"
-                        )
-                    )
+        
+        except Exception as e:
+            print(f"Ошибка обработки поиска работы {job_search.id}: {e}")
+            # Незаписанная часть страницы отбрасывается - водяной знак не сдвинут, вакансии найдутся снова
+            await session.rollback()
+        
+        return queued_count
+    
+    async def process_user(self, user_id: int, job_search_ids: List[int]) -> int:
+        """Обработка захваченных поисков пользователя в собственной сессии"""
+        async with AsyncSessionLocal() as session:
+            return await self.process_job_searches(session, job_search_ids)
+    
+    async def process_job_searches(self, session: AsyncSession, job_search_ids: List[int]) -> int:
+        """Обработка поисков по очереди в одной сессии.
+        
+        Поиск читается по id непосредственно перед обработкой: ошибка
+        предыдущего поиска откатывает сессию, и загруженные заранее объекты
+        стали бы устаревшими.
+        """
+        queued_count = 0
+        for job_search_id in sorted(job_search_ids):
+            job_search = await session.get(JobSearch, job_search_id)
+            if job_search is None or not job_search.is_active:
+                continue
+            queued_count += await self.process_job_search(session, job_search)
+        return queued_count
+    
+    async def _process_user_limited(self, semaphore: asyncio.Semaphore, user_id: int,
+                                    job_search_ids: List[int], check_interval: int) -> int:
+        """Обработка пользователя с учетом общего лимита параллелизма и бюджета времени"""
+        async with semaphore:
+            try:
+                return await asyncio.wait_for(
+                    self.process_user(user_id, job_search_ids),
+                    timeout=settings.user_timeout_seconds
                 )
-                if today_applications.scalars().count() >= settings.max_applications_per_day:
-                    print(f"Достигнут лимит откликов в день для пользователя {job_search.user_id}: {settings.max_applications_per_day}")
-                    return applied_count
-                
+            except asyncio.TimeoutError:
+                print(f"Превышено время обработки пользователя {user_id}: {settings.user_timeout_seconds} сек")
+            except Exception as e:
+                print(f"Ошибка обработки пользователя {user_id}: {e}")
+            finally:
+                # Аренда снимается в любом случае, следующий запуск - через интервал поиска
                 try:
-                    # Создаем отклик
-                    from app.types import HHApplicationRequest
-                    application_request = HHApplicationRequest(
-                        resume_id=credentials.resume_id,
-                        vacancy_id=vacancy.id,
-                        message=job_search.cover_letter
-                    )
-                    
-                    # Отправляем отклик
-                    application_response = await hh_api_client.apply_to_vacancy(application_request, credentials.access_token)
-                    
-                    # Логируем успешный отклик
-                    await self.log_request(
-                        session,
-                        "apply_vacancy",
-                        "success",
-                        user_id=job_search.user_id,
-                        job_search_id=job_search.id,
-                        details=f"Вакансия: {vacancy.name}, Компания: {vacancy.employer.get('name', 'Неизвестная компания')}"
-                    )
-                    
-                    # Сохраняем в базу
-                    await self.save_application(
-                        session=session,
-                        job_search_id=job_search.id,
-                        user_id=job_search.user_id,
-                        vacancy_id=vacancy.id,
-                        vacancy_title=vacancy.name,
-                        company_name=vacancy.employer.get("name", "Неизвестная компания"),
-                        status="success"
-                    )
-                    
-                    applied_count += 1
-                    print(f"Успешно откликнулись на вакансию: {vacancy.name}")
-                    
-                    # Пауза между откликами
-                    await asyncio.sleep(5)
-                    
+                    async with AsyncSessionLocal() as session:
+                        result = await session.execute(
+                            select(JobSearch.id, JobSearch.check_interval_minutes).where(
+                                JobSearch.id.in_(job_search_ids)
+                            )
+                        )
+                        await self.leases.release(session, {
+                            job_search_id: jittered_run_at(
+                                (interval or check_interval) * 60, settings.scheduler_jitter_ratio
+                            )
+                            for job_search_id, interval in result.all()
+                        })
                 except Exception as e:
-                    print(f"Ошибка отклика на вакансию {vacancy.id}: {e}")
+                    print(f"Ошибка снятия аренды поисков пользователя {user_id}: {e}")
+            return 0
+    
+    async def run_cycle(self) -> int:
+        """Один проход по поискам, которые пора запускать и которые удалось захватить"""
+        async with AsyncSessionLocal() as session:
+            # Счетчики откликов перезаполняются в каждом цикле
+            self.daily_counter.reset(await self.get_max_applications_per_day(session))
+            
+            # Результаты поиска живут в общем кэше не дольше самого короткого интервала поиска
+            check_interval = await self.get_check_interval(session)
+            min_interval, _ = await self.get_check_interval_bounds(session)
+            from app.utils.hh_api import hh_api_client
+            hh_api_client.search_cache.ttl = min(check_interval, min_interval) * 60
+            
+            # Захватываем поиски: другие воркеры их уже не возьмут, пока действует аренда
+            claimed_ids = await self.leases.claim_due(session, settings.scheduler_claim_batch_size)
+            if not claimed_ids:
+                return 0
+            
+            result = await session.execute(
+                select(JobSearch.id, JobSearch.user_id).where(JobSearch.id.in_(claimed_ids))
+            )
+            searches_by_user: Dict[int, List[int]] = {}
+            for job_search_id, user_id in result.all():
+                searches_by_user.setdefault(user_id, []).append(job_search_id)
+            
+            # Учетные данные всех пользователей цикла загружаются одним запросом
+            from app.utils.credentials import credentials_cache
+            await credentials_cache.load_many(session, list(searches_by_user))
+        
+        # Каждый пользователь обрабатывается в своей задаче и своей сессии
+        semaphore = asyncio.Semaphore(settings.max_concurrent_users)
+        async with self.leases.keep_alive(claimed_ids):
+            results = await asyncio.gather(*(
+                self._process_user_limited(semaphore, user_id, job_search_ids, check_interval)
+                for user_id, job_search_ids in searches_by_user.items()
+            ))
+        total_queued = sum(results)
+        
+        if total_queued > 0:
+            print(f"Обработано пользователей: {len(searches_by_user)}, поисков: {len(claimed_ids)}, в очередь откликов: {total_queued}")
+        else:
+            print("Новых вакансий для отклика не найдено")
+        
+        return total_queued
+    
+    async def _send_user_applications(self, semaphore: asyncio.Semaphore, user_id: int, task_ids: List[int]) -> int:
+        """Отправка захваченных откликов пользователя по очереди - темп задает лимит откликов токена"""
+        sent_count = 0
+        async with semaphore:
+            try:
+                async with AsyncSessionLocal() as session:
+                    from app.utils.credentials import credentials_cache
+                    credentials = await credentials_cache.get(session, user_id)
                     
-                    # Логируем ошибку отклика
-                    await self.log_request(
-                        session,
-                        "apply_vacancy",
-                        "failed",
-                        user_id=job_search.user_id,
-                        job_search_id=job_search.id,
-                        details=f"Вакансия: {vacancy.name}",
-                        error_message=str(e)
-                    )
+                    # Истекший токен пробуем обновить до отправки откликов
+                    if credentials and credentials.expires_at and credentials.expires_at <= datetime.now():
+                        from app.utils.token_refresher import token_refresher
+                        try:
+                            credentials = await token_refresher.refresh_user(user_id) or credentials
+                        except Exception as e:
+                            print(f"Не удалось обновить токен пользователя {user_id}: {e}")
                     
-                    # Сохраняем неудачный отклик
-                    await self.save_application(
-                        session=session,
-                        job_search_id=job_search.id,
-                        user_id=job_search.user_id,
-                        vacancy_id=vacancy.id,
-                        vacancy_title=vacancy.name,
-                        company_name=vacancy.employer.get("name", "Неизвестная компания"),
-                        status="failed"
+                    result = await session.execute(
+                        select(ApplyTask, JobSearch).outerjoin(
+                            JobSearch, ApplyTask.job_search_id == JobSearch.id
+                        ).where(ApplyTask.id.in_(task_ids)).order_by(ApplyTask.id)
                     )
+                    for task, job_search in result.all():
+                        if await self.send_application(session, task, job_search, credentials):
+                            sent_count += 1
+            except Exception as e:
+                print(f"Ошибка отправки откликов пользователя {user_id}: {e}")
+        return sent_count
+    
+    async def drain_apply_queue(self, user_id: Optional[int] = None) -> Tuple[int, int]:
+        """Отправка пачки откликов из очереди. Возвращает (взято задач, отправлено откликов)"""
+        async with AsyncSessionLocal() as session:
+            claimed_ids = await self.apply_queue.claim(session, settings.apply_queue_claim_batch_size, user_id)
+            if not claimed_ids:
+                return 0, 0
+            
+            result = await session.execute(
+                select(ApplyTask.id, ApplyTask.user_id).where(ApplyTask.id.in_(claimed_ids))
+            )
+            tasks_by_user: Dict[int, List[int]] = {}
+            for task_id, task_user_id in result.all():
+                tasks_by_user.setdefault(task_user_id, []).append(task_id)
+            
+            from app.utils.credentials import credentials_cache
+            await credentials_cache.load_many(session, list(tasks_by_user))
         
-        except Exception as e:
-            print(f"Ошибка обработки поиска работы {job_search.id}: {e}")
+        # Пользователи обрабатываются параллельно, отклики одного пользователя - последовательно
+        semaphore = asyncio.Semaphore(settings.max_concurrent_users)
+        results = await asyncio.gather(*(
+            self._send_user_applications(semaphore, task_user_id, task_ids)
+            for task_user_id, task_ids in tasks_by_user.items()
+        ))
+        total_sent = sum(results)
         
-        return applied_count
+        print(f"Из очереди взято откликов: {len(claimed_ids)}, отправлено: {total_sent}")
+        return len(claimed_ids), total_sent
     
     async def run_auto_apply_loop(self):
         """Основной цикл автоматического отклика"""
         self.is_running = True
-        print("Запущен автоматический отклик на вакансии")
+        print(f"Запущен автоматический отклик на вакансии (воркер {self.worker_id})")
         
         while self.is_running:
             try:
                 async with AsyncSessionLocal() as session:
-                    # Получаем всех пользователей с активными поисками
-                    from app.database import User, JobSearch
-                    from sqlalchemy import select
-                    
-                    # Получаем пользователей с активными поисками
-                    result = await session.execute(
-                        select(User.id).distinct().join(JobSearch).where(JobSearch.is_active == True)
-                    )
-                    user_ids = [row[0] for row in result.fetchall()]
-                    
-                    total_applied = 0
-                    for user_id in user_ids:
-                        # Получаем активные поиски для каждого пользователя
-                        job_searches = await self.get_job_searches(session, user_id)
-                        
-                        for job_search in job_searches:
-                            applied = await self.process_job_search(session, job_search)
-                            total_applied += applied
-                    
-                    if total_applied > 0:
-                        print(f"Обработано пользователей: {len(user_ids)}, откликов: {total_applied}")
-                    else:
-                        print("Новых вакансий для отклика не найдено")
+                    enabled = await self.is_auto_apply_enabled(session)
+                
+                # Отклик выключен из веб-интерфейса - ждем, пока его включат
+                if not enabled:
+                    await asyncio.sleep(settings.worker_idle_poll_seconds)
+                    continue
                 
-                # Получаем настраиваемый интервал
-                check_interval = await self.get_check_interval(session)
+                await self.run_cycle()
                 
-                # Ждем следующего цикла
-                await asyncio.sleep(check_interval * 60)
+                # Спим до ближайшего запуска, но не дольше интервала опроса:
+                # поиск могли создать или поставить в очередь из веб-интерфейса
+                async with AsyncSessionLocal() as session:
+                    next_due_at = await self.leases.next_due_at(session)
+                delay = settings.scheduler_poll_seconds
+                if next_due_at is not None:
+                    delay = min(delay, max(0.0, (next_due_at - datetime.now()).total_seconds()))
+                await asyncio.sleep(delay)
                 
             except Exception as e:
                 print(f"Ошибка в цикле автоматического отклика: {e}")
                 await asyncio.sleep(300)  # Ждем 5 минут при ошибке
     
-    def start_auto_apply(self):
-        """Запуск автоматического отклика в фоне"""
+    async def run_apply_loop(self):
+        """Цикл отправки откликов из очереди"""
+        self.is_running = True
+        
+        while self.is_running:
+            try:
+                async with AsyncSessionLocal() as session:
+                    enabled = await self.is_auto_apply_enabled(session)
+                
+                if not enabled:
+                    await asyncio.sleep(settings.worker_idle_poll_seconds)
+                    continue
+                
+                claimed, _ = await self.drain_apply_queue()
+                if not claimed:
+                    await asyncio.sleep(settings.apply_queue_poll_seconds)
+                
+            except Exception as e:
+                print(f"Ошибка в цикле отправки откликов: {e}")
+                await asyncio.sleep(settings.apply_queue_poll_seconds)
+    
+    def start_auto_apply(self, search: bool = True, apply: bool = True):
+        """Запуск автоматического отклика в фоне (поиск и отправка откликов - отдельные задачи)"""
         if not self.is_running:
-            self.task = asyncio.create_task(self.run_auto_apply_loop())
+            self.is_running = True
+            if search:
+                self.task = asyncio.create_task(self.run_auto_apply_loop())
+            if apply:
+                self.apply_loop_task = asyncio.create_task(self.run_apply_loop())
     
     def stop_auto_apply(self):
         """Остановка автоматического отклика"""
         self.is_running = False
         if self.task:
             self.task.cancel()
+        if self.apply_loop_task:
+            self.apply_loop_task.cancel()
 
 
 # Глобальный экземпляр сервиса
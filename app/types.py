@@ -171,10 +171,26 @@ class ApplicationResponse(BaseModel):
         from_attributes = True
 
 
+class ApplicationPage(BaseModel):
+    """Страница откликов"""
+    items: List[ApplicationResponse]
+    next_cursor: Optional[str] = None  # None - страница последняя
+
+
+class ApplicationStats(BaseModel):
+    """Число откликов пользователя по статусам"""
+    total: int = 0
+    success: int = 0
+    failed: int = 0
+    pending: int = 0
+
+
 class SystemSettings(BaseModel):
     """Настройки системы"""
     check_interval_minutes: int = Field(30, ge=5, le=1440)
     max_applications_per_day: int = Field(50, ge=1, le=200)
+    min_check_interval_minutes: int = Field(5, ge=1, le=1440)
+    max_check_interval_minutes: int = Field(1440, ge=1, le=10080)
     max_users: int = Field(100, ge=1, le=1000)
 
 
@@ -190,4 +206,10 @@ class RequestLogResponse(BaseModel):
     created_at: datetime
     
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+
+class RequestLogPage(BaseModel):
+    """Страница логов запросов"""
+    items: List[RequestLogResponse]
+    next_cursor: Optional[str] = None  # None - страница последняя
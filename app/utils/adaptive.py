@@ -0,0 +1,30 @@
+from typing import Optional
+
+# Средний выход новых вакансий за проход, выше которого поиск проверяется чаще
+HIGH_YIELD = 1.0
+# Средний выход, ниже которого поиск проверяется реже
+LOW_YIELD = 0.2
+SPEEDUP_FACTOR = 0.5
+SLOWDOWN_FACTOR = 1.5
+
+
+def update_yield(previous: Optional[float], new_vacancies: int, alpha: float) -> float:
+    """Экспоненциальное скользящее среднее числа новых вакансий за проход"""
+    if previous is None:
+        return float(new_vacancies)
+    return alpha * new_vacancies + (1 - alpha) * previous
+
+
+def adapt_interval(current: int, yield_score: float, min_interval: int, max_interval: int) -> int:
+    """Новый интервал проверки поиска в минутах по его среднему выходу.
+
+    Урожайные поиски проверяются чаще, пустые - реже, в пределах
+    заданных администратором границ. Выход считается за проход, поэтому
+    при сокращении интервала он падает, и интервал сам находит равновесие.
+    """
+    interval = float(current)
+    if yield_score >= HIGH_YIELD:
+        interval *= SPEEDUP_FACTOR
+    elif yield_score < LOW_YIELD:
+        interval *= SLOWDOWN_FACTOR
+    return int(round(min(max(interval, min_interval), max_interval)))
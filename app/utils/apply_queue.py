@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import ApplyTask, JobSearch, insert_ignoring_conflicts
+from app.types import HHVacancy
+from app.utils.leases import claim_rows
+from app.utils.retry import RetryPolicy
+
+
+class ApplyQueue:
+    """Персистентная очередь откликов (таблица apply_queue).
+
+    Поиск только ставит найденные вакансии в очередь, а отправляют отклики
+    отдельные воркеры. Задача забирается условным UPDATE и закрепляется за
+    воркером до locked_until: если воркер упал, после этого срока ее заберет
+    другой. Неудачные попытки повторяются с экспоненциальной задержкой,
+    завершенная задача удаляется - результат хранится в applications.
+    """
+
+    QUEUED = "queued"
+    IN_PROGRESS = "in_progress"
+
+    def __init__(self, owner: str, lock_seconds: int, max_attempts: int,
+                 retry_base_seconds: float, retry_max_seconds: float):
+        self.owner = owner
+        self.lock_seconds = lock_seconds
+        self.max_attempts = max_attempts
+        self._backoff = RetryPolicy(max_attempts, retry_base_seconds, retry_max_seconds)
+
+    def _is_due(self, now: datetime):
+        return or_(
+            and_(ApplyTask.status == self.QUEUED, ApplyTask.next_attempt_at <= now),
+            # Задача упавшего воркера возвращается в работу после истечения блокировки
+            and_(ApplyTask.status == self.IN_PROGRESS, ApplyTask.locked_until < now)
+        )
+
+    async def enqueue(self, session: AsyncSession, job_search: JobSearch, vacancy: HHVacancy) -> bool:
+        """Добавление вакансии в очередь (фиксируется при commit сессии).
+
+        Вставка с ON CONFLICT DO NOTHING: ту же вакансию пользователя могут
+        одновременно ставить в очередь разные воркеры. Возвращает True, если
+        задача добавлена этим вызовом.
+        """
+        result = await session.execute(
+            insert_ignoring_conflicts(ApplyTask, session.bind.dialect.name, ["user_id", "vacancy_id"]).values(
+                user_id=job_search.user_id,
+                job_search_id=job_search.id,
+                vacancy_id=vacancy.id,
+                vacancy_title=vacancy.name,
+                company_name=vacancy.employer.get("name", "Неизвестная компания"),
+                status=self.QUEUED,
+                attempts=0,
+                next_attempt_at=datetime.now()
+            )
+        )
+        return result.rowcount == 1
+
+    async def queued_vacancy_ids(self, session: AsyncSession, user_id: int, vacancy_ids: List[str]) -> Set[str]:
+        """Вакансии из списка, которые уже стоят в очереди пользователя"""
+        if not vacancy_ids:
+            return set()
+        result = await session.execute(
+            select(ApplyTask.vacancy_id).where(
+                ApplyTask.user_id == user_id,
+                ApplyTask.vacancy_id.in_(vacancy_ids)
+            )
+        )
+        return set(result.scalars().all())
+
+    async def count_pending(self, session: AsyncSession, user_id: int) -> int:
+        """Число неотправленных откликов пользователя"""
+        result = await session.execute(
+            select(func.count(ApplyTask.id)).where(ApplyTask.user_id == user_id)
+        )
+        return result.scalar_one()
+
+    async def claim(self, session: AsyncSession, limit: int, user_id: Optional[int] = None) -> List[int]:
+        """Захват задач, которые пора отправлять. Возвращает id захваченных"""
+        now = datetime.now()
+        query = select(ApplyTask.id).where(self._is_due(now))
+        if user_id is not None:
+            query = query.where(ApplyTask.user_id == user_id)
+        return await claim_rows(
+            session, ApplyTask, query.order_by(ApplyTask.next_attempt_at).limit(limit), self._is_due(now), {
+                "status": self.IN_PROGRESS,
+                "locked_by": self.owner,
+                "locked_until": now + timedelta(seconds=self.lock_seconds),
+                "attempts": ApplyTask.attempts + 1
+            }
+        )
+
+    async def complete(self, session: AsyncSession, task: ApplyTask):
+        """Удаление выполненной задачи (фиксируется вместе с записью отклика)"""
+        await session.execute(
+            delete(ApplyTask).where(ApplyTask.id == task.id).execution_options(synchronize_session=False)
+        )
+
+    def can_retry(self, task: ApplyTask) -> bool:
+        return task.attempts < self.max_attempts
+
+    async def retry_later(self, session: AsyncSession, task: ApplyTask, error: str):
+        """Возврат задачи в очередь с экспоненциальной задержкой"""
+        await session.execute(
+            update(ApplyTask).where(ApplyTask.id == task.id).values(
+                status=self.QUEUED,
+                locked_by=None,
+                locked_until=None,
+                last_error=error,
+                next_attempt_at=datetime.now() + timedelta(seconds=self._backoff.backoff(task.attempts))
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def postpone(self, session: AsyncSession, task: ApplyTask, until: datetime, reason: str):
+        """Возврат задачи в очередь до указанного времени без расхода попытки"""
+        await session.execute(
+            update(ApplyTask).where(ApplyTask.id == task.id).values(
+                status=self.QUEUED,
+                locked_by=None,
+                locked_until=None,
+                last_error=reason,
+                attempts=ApplyTask.attempts - 1,
+                next_attempt_at=until
+            ).execution_options(synchronize_session=False)
+        )
+
+    async def stats(self, session: AsyncSession) -> Dict[str, int]:
+        """Число задач в очереди по статусам"""
+        result = await session.execute(
+            select(ApplyTask.status, func.count(ApplyTask.id)).group_by(ApplyTask.status)
+        )
+        counts = {self.QUEUED: 0, self.IN_PROGRESS: 0}
+        counts.update(dict(result.all()))
+        return counts
@@ -0,0 +1,100 @@
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.config import settings
+from app.database import HHUserCredentials
+from app.types import HHUserAuth
+
+
+def token_expires_at(auth: HHUserAuth) -> datetime:
+    """Локальное время истечения access token"""
+    return datetime.now() + timedelta(seconds=auth.expires_in)
+
+
+class CredentialsCache:
+    """Кэш последних учетных данных HH.ru пользователей.
+
+    В начале цикла заполняется одним запросом сразу для всех пользователей,
+    OAuth-обработчики сбрасывают запись пользователя при смене токенов.
+    Токены может обновить и другой процесс (воркер), поэтому записи живут
+    ttl секунд, а учетные данные с истекшим access token перечитываются.
+    Объекты хранятся отсоединенными от сессий и используются только для чтения.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        # user_id -> (время загрузки по time.monotonic(), учетные данные)
+        self._items: Dict[int, Tuple[float, Optional[HHUserCredentials]]] = {}
+
+    def latest_many_query(self, user_ids: List[int]) -> Select:
+        """Запрос последних учетных данных для списка пользователей"""
+        latest_ids = (
+            select(func.max(HHUserCredentials.id))
+            .where(HHUserCredentials.user_id.in_(user_ids))
+            .group_by(HHUserCredentials.user_id)
+        )
+        return select(HHUserCredentials).where(HHUserCredentials.id.in_(latest_ids))
+
+    def latest_query(self, user_id: int) -> Select:
+        """Запрос последних учетных данных пользователя"""
+        return select(HHUserCredentials).where(
+            HHUserCredentials.user_id == user_id
+        ).order_by(HHUserCredentials.created_at.desc()).limit(1)
+
+    async def load_many(self, session: AsyncSession, user_ids: List[int]):
+        """Загрузка последних учетных данных для списка пользователей одним запросом"""
+        if not user_ids:
+            return
+
+        result = await session.execute(self.latest_many_query(user_ids))
+        found = {}
+        for credentials in result.scalars().all():
+            session.expunge(credentials)
+            found[credentials.user_id] = credentials
+
+        # Отсутствие учетных данных тоже кэшируется
+        for user_id in user_ids:
+            self.put(user_id, found.get(user_id))
+
+    def _lookup(self, user_id: int) -> Tuple[bool, Optional[HHUserCredentials]]:
+        entry = self._items.get(user_id)
+        if entry is None:
+            return False, None
+
+        loaded_at, credentials = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            return False, None
+        if credentials is not None and credentials.expires_at and credentials.expires_at <= datetime.now():
+            # Истекший токен мог уже обновить другой процесс
+            return False, None
+        return True, credentials
+
+    async def get(self, session: AsyncSession, user_id: int) -> Optional[HHUserCredentials]:
+        """Последние учетные данные пользователя"""
+        found, credentials = self._lookup(user_id)
+        if found:
+            return credentials
+
+        result = await session.execute(self.latest_query(user_id))
+        credentials = result.scalar_one_or_none()
+        if credentials is not None:
+            session.expunge(credentials)
+        self.put(user_id, credentials)
+        return credentials
+
+    def put(self, user_id: int, credentials: Optional[HHUserCredentials]):
+        """Запись заведомо актуальных (отсоединенных от сессии) учетных данных"""
+        self._items[user_id] = (time.monotonic(), credentials)
+
+    def invalidate(self, user_id: int):
+        """Сброс записи пользователя после изменения его токенов"""
+        self._items.pop(user_id, None)
+
+
+# Глобальный кэш учетных данных
+credentials_cache = CredentialsCache(ttl=settings.credentials_cache_ttl_seconds)
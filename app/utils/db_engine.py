@@ -0,0 +1,99 @@
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class EngineProfile(BaseModel):
+    """Набор параметров движка базы данных"""
+    echo: bool = False
+
+    # SQLite: применяются PRAGMA при каждом новом соединении
+    sqlite_journal_mode: str = "WAL"  # WAL - чтение не блокируется записью
+    sqlite_synchronous: str = "NORMAL"  # В режиме WAL безопасно и намного быстрее FULL
+    sqlite_busy_timeout_ms: int = 5000  # Ожидание блокировки вместо ошибки "database is locked"
+    sqlite_cache_size_kib: int = 65536  # Кэш страниц на соединение
+    sqlite_mmap_size_bytes: int = 268435456  # Чтение файла базы через mmap
+    sqlite_reuse_connections: bool = True  # Пул соединений вместо нового соединения на каждую сессию
+
+    # Серверные СУБД (и пул соединений SQLite)
+    pool_size: int = 10
+    max_overflow: int = 20
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800  # Пересоздание соединений старше N секунд
+    pool_pre_ping: bool = True  # Проверка соединения перед выдачей из пула
+
+
+# Именованные профили, выбираются настройкой DATABASE_PROFILE
+ENGINE_PROFILES: Dict[str, EngineProfile] = {
+    "production": EngineProfile(),
+    # Разработка: лог всех SQL запросов и стандартный журнал SQLite
+    "development": EngineProfile(
+        echo=True,
+        sqlite_journal_mode="DELETE",
+        sqlite_synchronous="FULL",
+        sqlite_cache_size_kib=2000,
+        sqlite_mmap_size_bytes=0,
+        sqlite_reuse_connections=False,
+        pool_size=5,
+        max_overflow=5
+    ),
+}
+
+
+def get_engine_profile(name: str, echo: Optional[bool] = None) -> EngineProfile:
+    """Профиль по имени с учетом явно заданного DATABASE_ECHO"""
+    if name not in ENGINE_PROFILES:
+        raise ValueError(
+            f"Неизвестный профиль базы данных: {name} (доступны: {', '.join(ENGINE_PROFILES)})"
+        )
+    profile = ENGINE_PROFILES[name]
+    if echo is not None:
+        profile = profile.copy(update={"echo": echo})
+    return profile
+
+
+def _set_sqlite_pragmas(engine: AsyncEngine, profile: EngineProfile):
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={profile.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={profile.sqlite_synchronous}")
+        cursor.execute(f"PRAGMA busy_timeout={profile.sqlite_busy_timeout_ms}")
+        # Отрицательное значение cache_size задает размер в КиБ, а не в страницах
+        cursor.execute(f"PRAGMA cache_size=-{profile.sqlite_cache_size_kib}")
+        cursor.execute(f"PRAGMA mmap_size={profile.sqlite_mmap_size_bytes}")
+        cursor.close()
+
+
+def build_engine(database_url: str, profile: EngineProfile) -> AsyncEngine:
+    """Создание асинхронного движка с параметрами профиля для диалекта базы"""
+    url = make_url(database_url)
+    kwargs: Dict[str, Any] = {"echo": profile.echo}
+
+    if url.get_backend_name() == "sqlite":
+        in_memory = url.database in (None, "", ":memory:")
+        kwargs["connect_args"] = {"timeout": profile.sqlite_busy_timeout_ms / 1000}
+        if profile.sqlite_reuse_connections and not in_memory:
+            kwargs.update(
+                poolclass=AsyncAdaptedQueuePool,
+                pool_size=profile.pool_size,
+                max_overflow=profile.max_overflow,
+                pool_timeout=profile.pool_timeout
+            )
+        engine = create_async_engine(url, **kwargs)
+        if not in_memory:
+            _set_sqlite_pragmas(engine, profile)
+        return engine
+
+    kwargs.update(
+        pool_size=profile.pool_size,
+        max_overflow=profile.max_overflow,
+        pool_timeout=profile.pool_timeout,
+        pool_recycle=profile.pool_recycle,
+        pool_pre_ping=profile.pool_pre_ping
+    )
+    return create_async_engine(url, **kwargs)
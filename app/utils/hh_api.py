@@ -1,6 +1,8 @@
 import httpx
 import asyncio
-from typing import Optional, List, Dict, Any
+import hashlib
+import json
+from typing import Optional, List, Dict, Any, AsyncIterator, Callable
 from urllib.parse import urlparse, parse_qs
 from app.types import (
     HHVacancySearchParams, 
@@ -11,14 +13,84 @@ from app.types import (
     HHVacancy
 )
 from app.config import settings
+from app.utils.rate_limit import hh_rate_limiter, HHRateLimiter
+from app.utils.retry import hh_retry_policy, parse_retry_after
+from app.utils.cache import TTLCache
+from app.utils.http import build_http_client, ConnectionPoolMonitor
+from datetime import datetime
+
+
+class HHAPIError(Exception):
+    """Ошибка ответа API HH.ru с HTTP статусом"""
+    
+    def __init__(self, message: str, status_code: int, errors: Optional[List[Dict[str, Any]]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.errors = errors or []  # Список errors из тела ответа: [{"type": ..., "value": ...}]
+    
+    @property
+    def is_retryable(self) -> bool:
+        """Повтор имеет смысл только при лимите запросов и ошибках сервера"""
+        return self.status_code == 429 or self.status_code >= 500
+    
+    def has_error(self, value: str) -> bool:
+        """Есть ли в ответе ошибка с указанным value (например, already_applied)"""
+        return any(error.get("value") == value for error in self.errors)
+    
+    @property
+    def is_auth_error(self) -> bool:
+        """Токен недействителен (истек, отозван) - отказ не по существу запроса"""
+        return self.status_code == 401 or any(error.get("type") == "oauth" for error in self.errors)
+
+
+def parse_hh_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Разбор даты в формате HH.ru (2024-01-01T10:00:00+0300)"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
 
 
 class HHAPIClient:
     """Клиент для работы с API HH.ru"""
     
+    # HH.ru отдает не более 2000 вакансий по одному запросу (page * per_page < 2000)
+    MAX_SEARCH_DEPTH = 2000
+    
     def __init__(self):
         self.api_url = "https://api.hh.ru"
-        self.client = httpx.AsyncClient(timeout=30.0)
+        self.client = build_http_client(
+            max_connections=settings.hh_http_max_connections,
+            max_keepalive_connections=settings.hh_http_max_keepalive_connections,
+            keepalive_expiry=settings.hh_http_keepalive_expiry_seconds,
+            timeout=httpx.Timeout(
+                connect=settings.hh_http_connect_timeout,
+                read=settings.hh_http_read_timeout,
+                write=settings.hh_http_write_timeout,
+                pool=settings.hh_http_pool_timeout
+            ),
+            http2=settings.hh_http2
+        )
+        self.pool_monitor = ConnectionPoolMonitor(
+            settings.hh_http_max_connections,
+            pool_timeout=settings.hh_http_pool_timeout
+        )
+        # Данные вакансий не зависят от пользователя, поэтому кэш общий
+        self.vacancy_cache = TTLCache(
+            max_size=settings.vacancy_cache_max_size,
+            ttl=settings.vacancy_cache_ttl_seconds
+        )
+        # Результаты поиска общие для всех пользователей с одинаковыми параметрами
+        self.search_cache = TTLCache(
+            max_size=settings.search_cache_max_size,
+            ttl=settings.check_interval_minutes * 60
+        )
     
     async def close(self):
         await self.client.aclose()
@@ -31,6 +103,34 @@ class HHAPIClient:
             "Content-Type": "application/json"
         }
     
+    async def _request(self, method: str, path: str, kind: str, access_token: str,
+                       idempotent: bool = True, **kwargs) -> httpx.Response:
+        """Запрос к API с учетом лимита запросов токена и политики повторов"""
+        
+        async def send() -> httpx.Response:
+            await hh_rate_limiter.acquire(kind, access_token)
+            
+            async with self.pool_monitor.slot():
+                response = await self.client.request(
+                    method,
+                    f"{self.api_url}{path}",
+                    headers=self._get_headers(access_token),
+                    **kwargs
+                )
+            
+            if response.status_code == 429:
+                # HH.ru отклонил запрос по лимиту - притормаживаем все запросы этого токена
+                delay = parse_retry_after(response)
+                hh_rate_limiter.penalize(
+                    kind,
+                    access_token,
+                    delay if delay is not None else settings.hh_rate_limit_penalty_seconds
+                )
+            
+            return response
+        
+        return await hh_retry_policy.send(send, idempotent=idempotent)
+    
     def parse_search_url(self, search_url: str) -> HHVacancySearchParams:
         """Парсинг URL поиска вакансий в параметры API"""
         try:
@@ -81,17 +181,42 @@ class HHAPIClient:
         except Exception as e:
             raise ValueError(f"Ошибка парсинга URL: {e}")
     
-    async def search_vacancies(self, search_params: HHVacancySearchParams, access_token: str) -> HHVacancyResponse:
+    @staticmethod
+    def search_cache_key(params: Dict[str, Any]) -> str:
+        """Канонический ключ кэша для нормализованных параметров поиска"""
+        normalized = {}
+        for key, value in params.items():
+            if value is None or value == "":
+                continue
+            if isinstance(value, str):
+                value = " ".join(value.split())
+            normalized[key] = value
+        payload = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+    
+    async def search_vacancies(self, search_params: HHVacancySearchParams, access_token: str,
+                               use_cache: bool = True) -> HHVacancyResponse:
         """Поиск вакансий по параметрам"""
-        headers = self._get_headers(access_token)
-        
         # Преобразуем параметры в query string
         params = search_params.dict(exclude_none=True)
         
+        if not use_cache:
+            return await self._fetch_vacancies(params, access_token)
+        
+        # Одинаковые поиски разных пользователей уходят в HH.ru один раз за цикл
+        return await self.search_cache.get_or_load(
+            self.search_cache_key(params),
+            lambda: self._fetch_vacancies(params, access_token)
+        )
+    
+    async def _fetch_vacancies(self, params: Dict[str, Any], access_token: str) -> HHVacancyResponse:
+        """Запрос страницы результатов поиска в HH.ru в обход кэша"""
         try:
-            response = await self.client.get(
-                f"{self.api_url}/vacancies",
-                headers=headers,
+            response = await self._request(
+                "GET",
+                "/vacancies",
+                HHRateLimiter.SEARCH,
+                access_token,
                 params=params
             )
             response.raise_for_status()
@@ -101,16 +226,66 @@ class HHAPIClient:
             
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 429:
-                # Rate limit - ждем и повторяем
-                await asyncio.sleep(60)
-                return await self.search_vacancies(search_params, access_token)
-            else:
-                raise Exception(f"Ошибка API HH.ru: {e.response.status_code} - {e.response.text}")
+                raise Exception("Превышен лимит запросов к API HH.ru")
+            raise Exception(f"Ошибка API HH.ru: {e.response.status_code} - {e.response.text}")
+    
+    async def iter_vacancy_pages(
+        self,
+        search_params: HHVacancySearchParams,
+        access_token: str,
+        should_stop: Optional[Callable[[], bool]] = None,
+        per_page: Optional[int] = None
+    ) -> AsyncIterator[HHVacancyResponse]:
+        """Постраничный обход результатов поиска.
+        
+        Первая страница запрашивается отдельно, чтобы узнать общее число страниц,
+        остальные загружаются окнами по hh_search_page_concurrency запросов.
+        Обход прекращается, как только should_stop() вернет True.
+        """
+        per_page = per_page or settings.hh_search_per_page
+        params = search_params.copy(update={"page": 0, "per_page": per_page})
+        
+        first_page = await self.search_vacancies(params, access_token)
+        yield first_page
+        
+        total_pages = min(first_page.pages, self.MAX_SEARCH_DEPTH // per_page)
+        concurrency = max(1, settings.hh_search_page_concurrency)
+        
+        for window_start in range(1, total_pages, concurrency):
+            if should_stop and should_stop():
+                return
+            
+            window = range(window_start, min(window_start + concurrency, total_pages))
+            pages = await asyncio.gather(*(
+                self.search_vacancies(params.copy(update={"page": page}), access_token)
+                for page in window
+            ))
+            
+            for page in pages:
+                yield page
+                if should_stop and should_stop():
+                    return
+    
+    async def iter_vacancies(
+        self,
+        search_params: HHVacancySearchParams,
+        access_token: str,
+        should_stop: Optional[Callable[[], bool]] = None,
+        per_page: Optional[int] = None
+    ) -> AsyncIterator[HHVacancy]:
+        """Потоковый обход всех вакансий поиска по всем страницам"""
+        pages = self.iter_vacancy_pages(search_params, access_token, should_stop, per_page)
+        try:
+            async for page in pages:
+                for vacancy in page.items:
+                    if should_stop and should_stop():
+                        return
+                    yield vacancy
+        finally:
+            await pages.aclose()
     
     async def apply_to_vacancy(self, application: HHApplicationRequest, access_token: str) -> HHApplicationResponse:
         """Отклик на вакансию"""
-        headers = self._get_headers(access_token)
-        
         # Для отклика используем multipart/form-data
         form_data = {
             "resume_id": application.resume_id,
@@ -121,10 +296,13 @@ class HHAPIClient:
             form_data["message"] = application.message
         
         try:
-            response = await self.client.post(
-                f"{self.api_url}/negotiations",
-                data=form_data,
-                headers=headers
+            response = await self._request(
+                "POST",
+                "/negotiations",
+                HHRateLimiter.NEGOTIATIONS,
+                access_token,
+                idempotent=False,
+                data=form_data
             )
             
             if response.status_code == 201:
@@ -148,21 +326,24 @@ class HHAPIClient:
                 
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 429:
-                # Rate limit - ждем и повторяем
-                await asyncio.sleep(60)
-                return await self.apply_to_vacancy(application, access_token)
-            else:
-                error_data = e.response.json() if e.response.content else {}
-                raise Exception(f"Ошибка отклика на вакансию: {e.response.status_code} - {error_data}")
+                raise HHAPIError("Превышен лимит откликов через API HH.ru", 429)
+            error_data = e.response.json() if e.response.content else {}
+            if any(error.get("value") == "vacancy_archived" for error in error_data.get("errors", [])):
+                self.invalidate_vacancy(application.vacancy_id)
+            raise HHAPIError(
+                f"Ошибка отклика на вакансию: {e.response.status_code} - {error_data}",
+                e.response.status_code,
+                error_data.get("errors", [])
+            )
     
     async def get_user_resumes(self, access_token: str) -> HHResumeResponse:
         """Получение списка резюме пользователя"""
-        headers = self._get_headers(access_token)
-        
         try:
-            response = await self.client.get(
-                f"{self.api_url}/resumes/mine",
-                headers=headers
+            response = await self._request(
+                "GET",
+                "/resumes/mine",
+                HHRateLimiter.SEARCH,
+                access_token
             )
             response.raise_for_status()
             
@@ -172,14 +353,32 @@ class HHAPIClient:
         except httpx.HTTPStatusError as e:
             raise Exception(f"Ошибка получения резюме: {e.response.status_code} - {e.response.text}")
     
-    async def get_vacancy_details(self, vacancy_id: str, access_token: str) -> HHVacancy:
+    async def get_vacancy_details(self, vacancy_id: str, access_token: str, use_cache: bool = True) -> HHVacancy:
         """Получение детальной информации о вакансии"""
-        headers = self._get_headers(access_token)
+        if not use_cache:
+            return await self._fetch_vacancy_details(vacancy_id, access_token)
         
+        vacancy = await self.vacancy_cache.get_or_load(
+            vacancy_id,
+            lambda: self._fetch_vacancy_details(vacancy_id, access_token)
+        )
+        if vacancy.archived:
+            # Архивная вакансия больше не нужна в кэше
+            self.invalidate_vacancy(vacancy_id)
+        return vacancy
+    
+    def invalidate_vacancy(self, vacancy_id: str):
+        """Удаление вакансии из кэша"""
+        self.vacancy_cache.invalidate(vacancy_id)
+    
+    async def _fetch_vacancy_details(self, vacancy_id: str, access_token: str) -> HHVacancy:
+        """Запрос вакансии в HH.ru в обход кэша"""
         try:
-            response = await self.client.get(
-                f"{self.api_url}/vacancies/{vacancy_id}",
-                headers=headers
+            response = await self._request(
+                "GET",
+                f"/vacancies/{vacancy_id}",
+                HHRateLimiter.SEARCH,
+                access_token
             )
             response.raise_for_status()
             
@@ -191,12 +390,12 @@ class HHAPIClient:
     
     async def check_vacancy_application(self, vacancy_id: str, access_token: str) -> bool:
         """Проверка, откликался ли уже на вакансию"""
-        headers = self._get_headers(access_token)
-        
         try:
-            response = await self.client.get(
-                f"{self.api_url}/negotiations",
-                headers=headers,
+            response = await self._request(
+                "GET",
+                "/negotiations",
+                HHRateLimiter.SEARCH,
+                access_token,
                 params={"vacancy_id": vacancy_id}
             )
             
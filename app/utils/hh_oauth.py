@@ -1,11 +1,14 @@
+import asyncio
 import secrets
 import hashlib
 import time
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from urllib.parse import urlencode, parse_qs, urlparse
 import httpx
 from app.types import HHUserAuth, OAuthState
 from app.config import settings
+from app.utils.retry import hh_retry_policy
+from app.utils.http import build_http_client
 
 
 class HHOAuthClient:
@@ -17,6 +20,33 @@ class HHOAuthClient:
         self.redirect_uri = settings.hh_redirect_url
         self.base_url = "https://hh.ru"
         self.api_url = "https://api.hh.ru"
+        self._client: Optional[httpx.AsyncClient] = None
+    
+    def _create_client(self) -> httpx.AsyncClient:
+        return build_http_client(
+            max_connections=settings.hh_oauth_max_connections,
+            max_keepalive_connections=settings.hh_oauth_max_keepalive_connections,
+            keepalive_expiry=settings.hh_oauth_keepalive_expiry_seconds,
+            timeout=httpx.Timeout(settings.hh_oauth_timeout_seconds)
+        )
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Общий пул соединений с keep-alive для всех запросов к /token"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+        return self._client
+    
+    async def open(self):
+        """Создание пула соединений при старте приложения"""
+        if self._client is None or self._client.is_closed:
+            self._client = self._create_client()
+    
+    async def close(self):
+        """Закрытие пула соединений при остановке приложения"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     def generate_authorization_url(self, user_id: int, state: Optional[str] = None) -> str:
         """Генерация URL для авторизации пользователя"""
@@ -62,94 +92,107 @@ class HHOAuthClient:
     
     async def exchange_code_for_tokens(self, authorization_code: str) -> HHUserAuth:
         """Обмен authorization code на access и refresh токены"""
-        async with httpx.AsyncClient() as client:
-            data = {
-                "grant_type": "authorization_code",
-                "client_id": self.client_id,
-                "client_secret": self.client_secret,
-                "code": authorization_code,
-                "redirect_uri": self.redirect_uri
-            }
-            
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "User-Agent": settings.hh_user_agent
-            }
-            
-            response = await client.post(
-                f"{self.api_url}/token",
-                data=data,
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                error_data = response.json()
-                raise Exception(f"Ошибка получения токенов: {error_data}")
-            
-            token_data = response.json()
-            
-            # Вычисляем время истечения токена
-            expires_at = None
-            if "expires_in" in token_data:
-                expires_at = time.time() + token_data["expires_in"]
-            
-            return HHUserAuth(
-                access_token=token_data["access_token"],
-                refresh_token=token_data["refresh_token"],
-                expires_in=token_data["expires_in"],
-                token_type=token_data.get("token_type", "bearer"),
-                expires_at=expires_at
-            )
+        data = {
+            "grant_type": "authorization_code",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "code": authorization_code,
+            "redirect_uri": self.redirect_uri
+        }
+        
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "User-Agent": settings.hh_user_agent
+        }
+        
+        # Код авторизации и refresh token одноразовые - повторяем только неотправленные запросы
+        response = await hh_retry_policy.send(
+            lambda: self.client.post(f"{self.api_url}/token", data=data, headers=headers),
+            idempotent=False
+        )
+        
+        if response.status_code != 200:
+            error_data = response.json()
+            raise Exception(f"Ошибка получения токенов: {error_data}")
+        
+        token_data = response.json()
+        
+        # Вычисляем время истечения токена
+        expires_at = None
+        if "expires_in" in token_data:
+            expires_at = time.time() + token_data["expires_in"]
+        
+        return HHUserAuth(
+            access_token=token_data["access_token"],
+            refresh_token=token_data["refresh_token"],
+            expires_in=token_data["expires_in"],
+            token_type=token_data.get("token_type", "bearer"),
+            expires_at=expires_at
+        )
     
     async def refresh_tokens(self, refresh_token: str) -> HHUserAuth:
         """Обновление access токена с помощью refresh токена"""
-        async with httpx.AsyncClient() as client:
-            data = {
-                "grant_type": "refresh_token",
-                "refresh_token": refresh_token
-            }
-            
-            headers = {
-                "Content-Type": "application/x-www-form-urlencoded",
-                "User-Agent": settings.hh_user_agent
-            }
-            
-            response = await client.post(
-                f"{self.api_url}/token",
-                data=data,
-                headers=headers
-            )
-            
-            if response.status_code != 200:
-                error_data = response.json()
-                raise Exception(f"Ошибка обновления токенов: {error_data}")
-            
-            token_data = response.json()
-            
-            # Вычисляем время истечения токена
-            expires_at = None
-            if "expires_in" in token_data:
-                expires_at = time.time() + token_data["expires_in"]
-            
-            return HHUserAuth(
-                access_token=token_data["access_token"],
-                refresh_token=token_data["refresh_token"],
-                expires_in=token_data["expires_in"],
-                token_type=token_data.get("token_type", "bearer"),
-                expires_at=expires_at
-            )
+        data = {
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token
+        }
+        
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "User-Agent": settings.hh_user_agent
+        }
+        
+        # Код авторизации и refresh token одноразовые - повторяем только неотправленные запросы
+        response = await hh_retry_policy.send(
+            lambda: self.client.post(f"{self.api_url}/token", data=data, headers=headers),
+            idempotent=False
+        )
+        
+        if response.status_code != 200:
+            error_data = response.json()
+            raise Exception(f"Ошибка обновления токенов: {error_data}")
+        
+        token_data = response.json()
+        
+        # Вычисляем время истечения токена
+        expires_at = None
+        if "expires_in" in token_data:
+            expires_at = time.time() + token_data["expires_in"]
+        
+        return HHUserAuth(
+            access_token=token_data["access_token"],
+            refresh_token=token_data["refresh_token"],
+            expires_in=token_data["expires_in"],
+            token_type=token_data.get("token_type", "bearer"),
+            expires_at=expires_at
+        )
     
     async def revoke_token(self, access_token: str) -> bool:
         """Инвалидация access токена"""
-        async with httpx.AsyncClient() as client:
-            headers = {
-                "Authorization": f"Bearer {access_token}",
-                "User-Agent": settings.hh_user_agent
-            }
-            
-            response = await client.delete(f"{self.api_url}/token", headers=headers)
-            
-            return response.status_code == 204
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "User-Agent": settings.hh_user_agent
+        }
+        
+        response = await hh_retry_policy.send(
+            lambda: self.client.delete(f"{self.api_url}/token", headers=headers)
+        )
+        
+        return response.status_code == 204
+    
+    async def revoke_tokens(self, access_tokens: List[str]) -> int:
+        """Параллельная инвалидация нескольких access токенов. Возвращает число отозванных"""
+        semaphore = asyncio.Semaphore(settings.hh_oauth_max_connections)
+        
+        async def revoke(access_token: str) -> bool:
+            async with semaphore:
+                try:
+                    return await self.revoke_token(access_token)
+                except Exception:
+                    return False  # Ошибки отзыва не мешают отзыву остальных токенов
+        
+        results = await asyncio.gather(*(revoke(token) for token in access_tokens))
+        return sum(1 for revoked in results if revoked)
 
 
 # Глобальный экземпляр OAuth клиента
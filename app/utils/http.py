@@ -0,0 +1,99 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+import httpx
+
+
+def http2_available() -> bool:
+    """HTTP/2 в httpx требует необязательный пакет h2"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def build_http_client(max_connections: int, max_keepalive_connections: int, keepalive_expiry: float,
+                      timeout: httpx.Timeout, http2: bool = False) -> httpx.AsyncClient:
+    """Создание httpx клиента с заданным профилем пула соединений"""
+    if http2 and not http2_available():
+        print("HTTP/2 отключен: не установлен пакет h2 (pip install httpx[http2])")
+        http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+    )
+
+
+class ConnectionPoolMonitor:
+    """Учет ожидания свободного соединения в пуле.
+
+    Семафор размером с пул пропускает к клиенту не больше max_connections
+    запросов одновременно, поэтому время ожидания семафора и есть время
+    ожидания соединения, которое httpx напрямую не показывает. Сам httpx
+    при этом соединения не ждет, поэтому таймаут пула (pool_timeout)
+    применяется к ожиданию семафора.
+    """
+
+    def __init__(self, size: int, pool_timeout: Optional[float] = None):
+        self.size = size
+        self.pool_timeout = pool_timeout
+        self.requests = 0
+        self.waited_requests = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.pool_timeouts = 0
+        self._semaphore = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Занятие места в пуле на время одного запроса"""
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.pool_timeout)
+        except asyncio.TimeoutError:
+            self.pool_timeouts += 1
+            raise httpx.PoolTimeout(f"Нет свободного соединения за {self.pool_timeout} с")
+
+        try:
+            waited = time.monotonic() - started
+            self.requests += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            if waited >= 0.001:
+                self.waited_requests += 1
+
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                yield
+            except httpx.PoolTimeout:
+                self.pool_timeouts += 1
+                raise
+            finally:
+                self.in_flight -= 1
+        finally:
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Статистика ожидания соединений"""
+        return {
+            "size": self.size,
+            "requests": self.requests,
+            "waited_requests": self.waited_requests,
+            "avg_wait_ms": round(self.total_wait / self.requests * 1000, 2) if self.requests else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "pool_timeouts": self.pool_timeouts
+        }
@@ -0,0 +1,150 @@
+import asyncio
+import os
+import random
+import socket
+import uuid
+from contextlib import asynccontextmanager, suppress
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update, func, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+
+from app.database import AsyncSessionLocal, JobSearch
+
+
+def make_worker_id() -> str:
+    """Уникальный идентификатор процесса-воркера"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def jittered_run_at(interval_seconds: float, jitter_ratio: float) -> datetime:
+    """Время следующего запуска через интервал со случайным разбросом ±jitter_ratio.
+
+    Разброс не дает поискам с одинаковым интервалом собираться в одну
+    волну запросов к HH.ru.
+    """
+    jitter = interval_seconds * jitter_ratio
+    return datetime.now() + timedelta(seconds=interval_seconds + random.uniform(-jitter, jitter))
+
+
+async def claim_rows(session: AsyncSession, model, candidates: Select, is_claimable, values: Dict) -> List[int]:
+    """Захват строк модели условным UPDATE. Возвращает id захваченных.
+
+    candidates выбирает id строк-кандидатов, is_claimable - условие, при
+    котором строку еще можно забрать, values - значения, которые получает
+    захваченная строка.
+    """
+    # PostgreSQL: строки, которые сейчас захватывает другой воркер, пропускаются (SQLite игнорирует)
+    result = await session.execute(candidates.with_for_update(skip_locked=True))
+    candidate_ids = result.scalars().all()
+
+    claimed = []
+    for row_id in candidate_ids:
+        # Повторная проверка условия в самом UPDATE: другой воркер мог успеть раньше
+        result = await session.execute(
+            update(model).where(model.id == row_id, is_claimable)
+            .values(**values).execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            claimed.append(row_id)
+
+    await session.commit()
+    return claimed
+
+
+class JobSearchLeases:
+    """Аренда поисков работы между несколькими воркерами.
+
+    Воркер забирает поиск условным UPDATE: строка достается ему, только если
+    она свободна или аренда прежнего владельца истекла. Пока поиск
+    обрабатывается, аренда продлевается; после обработки она снимается и
+    назначается время следующего запуска (next_run_at).
+    """
+
+    def __init__(self, owner: str, ttl_seconds: int):
+        self.owner = owner
+        self.ttl_seconds = ttl_seconds
+
+    def _is_free(self, now: datetime):
+        return or_(JobSearch.lease_owner.is_(None), JobSearch.lease_expires_at < now)
+
+    def due_query(self, now: datetime, limit: int) -> Select:
+        """Запрос свободных активных поисков, которым пора запускаться"""
+        return select(JobSearch.id).where(
+            JobSearch.is_active == True,
+            or_(JobSearch.next_run_at.is_(None), JobSearch.next_run_at <= now),
+            self._is_free(now)
+        ).order_by(JobSearch.next_run_at.asc().nulls_first()).limit(limit)
+
+    async def claim_due(self, session: AsyncSession, limit: int) -> List[int]:
+        """Захват поисков, которым пора запускаться. Возвращает id захваченных"""
+        now = datetime.now()
+        return await claim_rows(session, JobSearch, self.due_query(now, limit), self._is_free(now), {
+            "lease_owner": self.owner,
+            "lease_expires_at": now + timedelta(seconds=self.ttl_seconds)
+        })
+
+    async def next_due_at(self, session: AsyncSession) -> Optional[datetime]:
+        """Ближайшее время запуска среди свободных активных поисков (None - поисков нет)"""
+        result = await session.execute(
+            select(
+                func.count(JobSearch.id).filter(JobSearch.next_run_at.is_(None)),
+                func.min(JobSearch.next_run_at)
+            ).where(
+                JobSearch.is_active == True,
+                JobSearch.lease_owner.is_(None)
+            )
+        )
+        never_run, next_run_at = result.one()
+        if never_run:
+            return datetime.now()
+        return next_run_at
+
+    async def renew(self, session: AsyncSession, job_search_ids: Iterable[int]):
+        """Продление аренды еще не отпущенных поисков"""
+        await session.execute(
+            update(JobSearch).where(
+                JobSearch.id.in_(list(job_search_ids)),
+                JobSearch.lease_owner == self.owner
+            ).values(
+                lease_expires_at=datetime.now() + timedelta(seconds=self.ttl_seconds)
+            ).execution_options(synchronize_session=False)
+        )
+        await session.commit()
+
+    async def release(self, session: AsyncSession, next_runs: Dict[int, datetime]):
+        """Снятие аренды с назначением следующего запуска каждому поиску"""
+        for job_search_id, next_run_at in next_runs.items():
+            await session.execute(
+                update(JobSearch).where(
+                    JobSearch.id == job_search_id,
+                    JobSearch.lease_owner == self.owner
+                ).values(
+                    lease_owner=None,
+                    lease_expires_at=None,
+                    next_run_at=next_run_at
+                ).execution_options(synchronize_session=False)
+            )
+        await session.commit()
+
+    async def _renew_loop(self, job_search_ids: List[int]):
+        while True:
+            await asyncio.sleep(self.ttl_seconds / 3)
+            try:
+                async with AsyncSessionLocal() as session:
+                    await self.renew(session, job_search_ids)
+            except Exception as e:
+                print(f"Ошибка продления аренды поисков: {e}")
+
+    @asynccontextmanager
+    async def keep_alive(self, job_search_ids: Iterable[int]):
+        """Фоновое продление аренды, пока выполняется блок"""
+        task = asyncio.create_task(self._renew_loop(list(job_search_ids)))
+        try:
+            yield
+        finally:
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
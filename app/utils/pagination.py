@@ -0,0 +1,49 @@
+import base64
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.sql import Select
+
+
+def encode_cursor(at: datetime, row_id: int) -> str:
+    """Курсор на строку: время и id последней строки страницы"""
+    raw = f"{at.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбор курсора. ValueError - курсор поврежден"""
+    try:
+        at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(at), int(row_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("Некорректный курсор страницы") from e
+
+
+def keyset_query(query: Select, at_column, id_column, cursor: Optional[str], limit: int) -> Select:
+    """Запрос страницы по ключу (at_column, id_column) от новых к старым.
+
+    Вместо OFFSET следующая страница начинается строго после последней
+    строки предыдущей, поэтому запрос читает из индекса только limit + 1
+    строк независимо от глубины страницы (лишняя строка показывает, что
+    страница не последняя).
+    """
+    if cursor:
+        at, row_id = decode_cursor(cursor)
+        query = query.where(or_(
+            at_column < at,
+            # Строки с одинаковым временем различаются по id
+            and_(at_column == at, id_column < row_id)
+        ))
+    return query.order_by(at_column.desc(), id_column.desc()).limit(limit + 1)
+
+
+def keyset_result(rows: List[Any], at_column, id_column, limit: int) -> Tuple[List[Any], Optional[str]]:
+    """Строки страницы и курсор следующей страницы (None - страница последняя)"""
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, at_column.key), getattr(last, id_column.key))
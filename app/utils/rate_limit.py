@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+from app.config import settings
+
+
+class TokenBucket:
+    """Асинхронный token bucket: rate токенов в секунду, не более capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self):
+        """Ожидание свободного токена. Ожидающие обслуживаются по очереди"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+
+                await asyncio.sleep(wait)
+
+    def penalize(self, delay: float):
+        """Приостановка bucket после отказа HH.ru по лимиту запросов"""
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+
+class HHRateLimiter:
+    """Ограничитель частоты запросов к API HH.ru.
+
+    Каждый запрос проходит через bucket своего access token (раздельно для
+    поиска и для откликов) и через общий bucket приложения (HH-User-Agent).
+    """
+
+    SEARCH = "search"
+    NEGOTIATIONS = "negotiations"
+
+    def __init__(self, max_buckets: int = 10000):
+        self.max_buckets = max_buckets
+        self.global_bucket = TokenBucket(settings.hh_global_rate_per_second, settings.hh_global_burst)
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+
+    def _create_bucket(self, kind: str) -> TokenBucket:
+        if kind == self.NEGOTIATIONS:
+            return TokenBucket(settings.hh_negotiations_rate_per_minute / 60, settings.hh_negotiations_burst)
+        return TokenBucket(settings.hh_search_rate_per_second, settings.hh_search_burst)
+
+    def _get_bucket(self, kind: str, access_token: str) -> TokenBucket:
+        key = (kind, access_token)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._create_bucket(kind)
+            self._buckets[key] = bucket
+            # Давно не использовавшиеся токены вытесняются
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    async def acquire(self, kind: str, access_token: str):
+        """Ожидание разрешения на запрос: сначала лимит токена, затем общий"""
+        await self._get_bucket(kind, access_token).acquire()
+        await self.global_bucket.acquire()
+
+    def penalize(self, kind: str, access_token: str, delay: float):
+        """Пауза для токена после ответа 429"""
+        self._get_bucket(kind, access_token).penalize(delay)
+
+
+# Глобальный экземпляр ограничителя запросов
+hh_rate_limiter = HHRateLimiter()
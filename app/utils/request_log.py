@@ -0,0 +1,98 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+
+from app.config import settings
+from app.database import AsyncSessionLocal, RequestLog
+
+
+# Маркер остановки фоновой записи
+_STOP = object()
+
+
+class RequestLogWriter:
+    """Фоновая запись логов запросов пачками.
+
+    Горячие участки кода только кладут записи в ограниченную очередь,
+    а фоновая задача сбрасывает их в базу одним bulk insert, как только
+    набирается batch_size записей или проходит flush_interval секунд.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, max_queue_size: int):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        self.dropped = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def start(self):
+        """Запуск фоновой записи в текущем event loop"""
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, **entry: Any):
+        """Постановка записи в очередь без ожидания записи в базу"""
+        self.start()
+        try:
+            self._queue.put_nowait(entry)
+        except asyncio.QueueFull:
+            # Очередь переполнена - лог теряется, но основной процесс не тормозит
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                print(f"Очередь логов запросов переполнена, отброшено записей: {self.dropped}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            entry = await self._queue.get()
+            if entry is _STOP:
+                break
+
+            batch = [entry]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    entry = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            await self._write(batch)
+
+    async def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(insert(RequestLog), batch)
+                await session.commit()
+        except Exception as e:
+            print(f"Ошибка записи логов запросов ({len(batch)} шт.): {e}")
+
+    async def stop(self):
+        """Остановка с записью всех накопленных логов"""
+        if self._task is None or self._task.done():
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+
+# Глобальный экземпляр записи логов запросов
+request_log_writer = RequestLogWriter(
+    batch_size=settings.request_log_batch_size,
+    flush_interval=settings.request_log_flush_interval_seconds,
+    max_queue_size=settings.request_log_max_queue_size
+)
@@ -0,0 +1,92 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+from app.config import settings
+
+
+# Ответы сервера, после которых идемпотентный запрос можно повторить
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Сетевые ошибки, при которых запрос гарантированно не был отправлен
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    """Задержка в секундах из заголовка Retry-After (число секунд или HTTP-дата)"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryPolicy:
+    """Повтор запросов с экспоненциальной задержкой и случайным разбросом.
+
+    Идемпотентные запросы повторяются при сетевых ошибках, 429 и 5xx.
+    Неидемпотентные (например, POST /negotiations) - только если запрос
+    заведомо не был обработан: ошибка соединения или отказ 429.
+    """
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int) -> float:
+        """Задержка перед повтором (full jitter)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _is_retryable_response(self, response: httpx.Response, idempotent: bool) -> bool:
+        if response.status_code == 429:
+            return True
+        return idempotent and response.status_code in RETRYABLE_STATUS_CODES
+
+    async def send(self, request: Callable[[], Awaitable[httpx.Response]], idempotent: bool = True) -> httpx.Response:
+        """Выполнение запроса с повторами. Возвращает последний полученный ответ"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                response = await request()
+            except httpx.TransportError as e:
+                if attempt >= self.max_attempts or not (idempotent or isinstance(e, NOT_SENT_ERRORS)):
+                    raise
+                await asyncio.sleep(self.backoff(attempt))
+                continue
+
+            if attempt >= self.max_attempts or not self._is_retryable_response(response, idempotent):
+                return response
+
+            delay = parse_retry_after(response)
+            if delay is None:
+                delay = self.backoff(attempt)
+            elif delay > self.max_delay:
+                # Сервер просит ждать дольше допустимого - не блокируем вызывающего
+                return response
+            else:
+                delay += random.uniform(0, self.base_delay)
+
+            await asyncio.sleep(delay)
+
+
+# Глобальная политика повторов запросов к HH.ru
+hh_retry_policy = RetryPolicy(
+    max_attempts=settings.hh_retry_max_attempts,
+    base_delay=settings.hh_retry_base_delay_seconds,
+    max_delay=settings.hh_retry_max_delay_seconds
+)
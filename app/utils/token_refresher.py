@@ -0,0 +1,148 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import select, func
+
+from app.config import settings
+from app.database import AsyncSessionLocal, HHUserCredentials
+from app.utils.credentials import credentials_cache, token_expires_at
+from app.utils.hh_oauth import hh_oauth_client
+from app.utils.request_log import request_log_writer
+
+
+class TokenRefresher:
+    """Фоновое обновление access token до истечения срока действия.
+
+    Периодически находит учетные данные, истекающие в ближайшие
+    token_refresh_margin_minutes, и обновляет их через
+    HHOAuthClient.refresh_tokens с ограниченным параллелизмом.
+    Для одного пользователя одновременно выполняется не больше одного
+    обновления: повторные вызовы дожидаются уже идущего.
+    """
+
+    def __init__(self):
+        self.is_running = False
+        self.task: Optional[asyncio.Task] = None
+        self._semaphore = asyncio.Semaphore(settings.token_refresh_concurrency)
+        self._inflight: Dict[int, asyncio.Task] = {}
+        # HH.ru может отказать в досрочном обновлении - повторяем не раньше истечения токена
+        self._not_before: Dict[int, datetime] = {}
+
+    async def refresh_user(self, user_id: int, force: bool = False) -> Optional[HHUserCredentials]:
+        """Обновление токена пользователя. Возвращает актуальные учетные данные"""
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.create_task(self._refresh(user_id, force))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _refresh(self, user_id: int, force: bool) -> Optional[HHUserCredentials]:
+        async with self._semaphore:
+            async with AsyncSessionLocal() as session:
+                # Читаем из базы, а не из кэша: токен мог обновить другой процесс
+                result = await session.execute(
+                    select(HHUserCredentials).where(
+                        HHUserCredentials.user_id == user_id
+                    ).order_by(HHUserCredentials.created_at.desc()).limit(1)
+                )
+                credentials = result.scalar_one_or_none()
+                if not credentials or not credentials.refresh_token:
+                    return None
+
+                refresh_before = datetime.now() + timedelta(minutes=settings.token_refresh_margin_minutes)
+                if not force and credentials.expires_at and credentials.expires_at > refresh_before:
+                    session.expunge(credentials)
+                    credentials_cache.put(user_id, credentials)
+                    return credentials
+
+                try:
+                    new_auth = await hh_oauth_client.refresh_tokens(credentials.refresh_token)
+                except Exception as e:
+                    if "not expired" in str(e) and credentials.expires_at:
+                        self._not_before[user_id] = credentials.expires_at
+                    request_log_writer.enqueue(
+                        user_id=user_id,
+                        request_type="token_refresh",
+                        status="failed",
+                        error_message=str(e)
+                    )
+                    raise
+
+                credentials.access_token = new_auth.access_token
+                credentials.refresh_token = new_auth.refresh_token or credentials.refresh_token
+                credentials.expires_at = token_expires_at(new_auth)
+                await session.commit()
+
+                session.expunge(credentials)
+                credentials_cache.put(user_id, credentials)
+                self._not_before.pop(user_id, None)
+
+                request_log_writer.enqueue(
+                    user_id=user_id,
+                    request_type="token_refresh",
+                    status="success",
+                    details=f"Токен действителен до {credentials.expires_at.isoformat()}"
+                )
+                return credentials
+
+    async def _refresh_safely(self, user_id: int) -> bool:
+        try:
+            return await self.refresh_user(user_id) is not None
+        except Exception as e:
+            print(f"Ошибка обновления токена пользователя {user_id}: {e}")
+            return False
+
+    async def refresh_expiring(self) -> int:
+        """Обновление всех токенов, истекающих в пределах запаса. Возвращает число обновленных"""
+        now = datetime.now()
+        refresh_before = now + timedelta(minutes=settings.token_refresh_margin_minutes)
+
+        async with AsyncSessionLocal() as session:
+            latest_ids = select(func.max(HHUserCredentials.id)).group_by(HHUserCredentials.user_id)
+            result = await session.execute(
+                select(HHUserCredentials.user_id).where(
+                    HHUserCredentials.id.in_(latest_ids),
+                    HHUserCredentials.refresh_token.isnot(None),
+                    HHUserCredentials.expires_at.isnot(None),
+                    HHUserCredentials.expires_at <= refresh_before
+                )
+            )
+            user_ids = [
+                user_id for user_id in result.scalars().all()
+                if self._not_before.get(user_id, now) <= now
+            ]
+
+        if not user_ids:
+            return 0
+
+        results = await asyncio.gather(*(self._refresh_safely(user_id) for user_id in user_ids))
+        refreshed = sum(1 for ok in results if ok)
+        print(f"Обновлено токенов: {refreshed} из {len(user_ids)}")
+        return refreshed
+
+    async def run_loop(self):
+        """Периодическая проверка истекающих токенов"""
+        self.is_running = True
+        while self.is_running:
+            try:
+                await self.refresh_expiring()
+            except Exception as e:
+                print(f"Ошибка в цикле обновления токенов: {e}")
+            await asyncio.sleep(settings.token_refresh_scan_interval_seconds)
+
+    def start(self):
+        """Запуск фонового обновления токенов"""
+        if not self.is_running:
+            self.task = asyncio.create_task(self.run_loop())
+
+    def stop(self):
+        """Остановка фонового обновления токенов"""
+        self.is_running = False
+        if self.task:
+            self.task.cancel()
+
+
+# Глобальный экземпляр обновления токенов
+token_refresher = TokenRefresher()
@@ -0,0 +1,102 @@
+"""Отдельный процесс автоматического отклика.
+
+Веб-процесс только управляет работой (включает и выключает отклик, ставит
+поиски в очередь), а поиск и отклики выполняет воркер:
+
+    python -m app.worker                  # постоянный цикл
+    python -m app.worker --once           # один проход, например из cron
+    python -m app.worker --concurrency 20 # больше пользователей параллельно
+    python -m app.worker --mode apply     # только отправка откликов из очереди
+
+Воркеров можно запускать несколько: поиски распределяются между ними
+через аренду в базе данных (app.utils.leases), отклики - через очередь
+apply_queue (app.utils.apply_queue), поэтому поиск и отправку откликов
+можно масштабировать независимо.
+"""
+import argparse
+import asyncio
+import signal
+from contextlib import suppress
+
+from app.config import settings
+from app.database import init_db
+from app.services import auto_apply_service
+from app.utils.hh_api import hh_api_client
+from app.utils.hh_oauth import hh_oauth_client
+from app.utils.request_log import request_log_writer
+from app.utils.token_refresher import token_refresher
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Воркер автоматического отклика на вакансии HH.ru")
+    parser.add_argument("--once", action="store_true",
+                        help="выполнить один проход по поискам, которые пора запускать, и выйти")
+    parser.add_argument("--mode", choices=("all", "search", "apply"), default="all",
+                        help="что выполнять: поиск вакансий, отправку откликов из очереди или все вместе")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="сколько пользователей обрабатывать параллельно (по умолчанию MAX_CONCURRENT_USERS)")
+    parser.add_argument("--worker-id", default=None,
+                        help="идентификатор воркера в аренде поисков (по умолчанию host:pid)")
+    return parser.parse_args(argv)
+
+
+async def run_once(mode: str) -> int:
+    """Один проход: поиск и/или отправка всего, что уже пора отправить. Возвращает число откликов"""
+    if mode in ("all", "search"):
+        await auto_apply_service.run_cycle()
+
+    total_sent = 0
+    if mode in ("all", "apply"):
+        while True:
+            claimed, sent = await auto_apply_service.drain_apply_queue()
+            total_sent += sent
+            if not claimed:
+                break
+    return total_sent
+
+
+async def run_worker(once: bool = False, mode: str = "all") -> int:
+    """Запуск воркера. Возвращает число откликов в режиме --once"""
+    await init_db()
+    await hh_oauth_client.open()
+
+    try:
+        if once:
+            # Разовый запуск не зависит от флага включения - его запускают явно
+            return await run_once(mode)
+
+        token_refresher.start()
+        auto_apply_service.start_auto_apply(search=mode != "apply", apply=mode != "search")
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            with suppress(NotImplementedError):
+                loop.add_signal_handler(sig, auto_apply_service.stop_auto_apply)
+
+        tasks = [task for task in (auto_apply_service.task, auto_apply_service.apply_loop_task) if task]
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return 0
+    finally:
+        auto_apply_service.stop_auto_apply()
+        token_refresher.stop()
+        await request_log_writer.stop()
+        await hh_api_client.close()
+        await hh_oauth_client.close()
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.concurrency:
+        settings.max_concurrent_users = args.concurrency
+    if args.worker_id:
+        auto_apply_service.worker_id = args.worker_id
+        auto_apply_service.leases.owner = args.worker_id
+        auto_apply_service.apply_queue.owner = args.worker_id
+
+    total_sent = asyncio.run(run_worker(once=args.once, mode=args.mode))
+    if args.once:
+        print(f"Проход завершен, отправлено откликов: {total_sent}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Перенос данных из файла SQLite (hh_auto_apply.db) в PostgreSQL.
+
+Целевая база берется из DATABASE_URL, например:
+
+    DATABASE_URL=postgresql+asyncpg://hh:hh@localhost:5432/hh_auto_apply \\
+        python copy_sqlite_to_postgres.py --source ./hh_auto_apply.db
+
+Схема в PostgreSQL создается по моделям (init_db), затем таблицы
+копируются пачками в порядке внешних ключей, а счетчики id выставляются
+после максимального перенесенного id. Целевая база должна быть пустой.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+# Добавляем текущую директорию в путь для импорта
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import select, func, inspect, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.database import engine, init_db, Base
+
+BATCH_SIZE = 1000
+
+
+async def source_columns(source_engine):
+    """Существующие в исходной базе таблицы и их колонки (старые базы могут быть без новых колонок)"""
+    def read(sync_conn):
+        inspector = inspect(sync_conn)
+        return {
+            table: {column["name"] for column in inspector.get_columns(table)}
+            for table in inspector.get_table_names()
+        }
+
+    async with source_engine.connect() as conn:
+        return await conn.run_sync(read)
+
+
+async def copy_table(source_engine, table, columns) -> int:
+    """Копирование одной таблицы пачками. Возвращает число строк"""
+    selected = [column for column in table.columns if column.name in columns]
+    copied = 0
+
+    async with source_engine.connect() as source:
+        # Колонки модели разбирают JSON, даты и булевы значения из формата SQLite
+        result = await source.stream(select(*selected).order_by(table.c.id))
+        async for rows in result.partitions(BATCH_SIZE):
+            batch = [dict(row._mapping) for row in rows]
+            async with engine.begin() as target:
+                # Дубли, запрещенные уникальными индексами (например, повторные отклики), пропускаются
+                await target.execute(insert(table).on_conflict_do_nothing(), batch)
+            copied += len(batch)
+    return copied
+
+
+async def reset_sequence(table):
+    """Следующий id после максимального перенесенного"""
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table.name}"
+        ))
+
+
+async def copy_database(source_path: str) -> bool:
+    if engine.dialect.name != "postgresql":
+        print(f"❌ DATABASE_URL должен указывать на PostgreSQL, сейчас: {engine.dialect.name}")
+        return False
+    if not os.path.exists(source_path):
+        print(f"❌ Файл базы не найден: {source_path}")
+        return False
+
+    print("🔄 Создание схемы в PostgreSQL...")
+    await init_db()
+
+    async with engine.connect() as conn:
+        for table in Base.metadata.sorted_tables:
+            count = (await conn.execute(select(func.count()).select_from(table))).scalar_one()
+            if count:
+                print(f"❌ Целевая база не пустая: в таблице {table.name} {count} строк")
+                return False
+
+    source_engine = create_async_engine(f"sqlite+aiosqlite:///{source_path}")
+    try:
+        existing = await source_columns(source_engine)
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing:
+                print(f"ℹ️ {table.name}: нет в исходной базе, пропущена")
+                continue
+            copied = await copy_table(source_engine, table, existing[table.name])
+            await reset_sequence(table)
+            print(f"✅ {table.name}: {copied} строк")
+    finally:
+        await source_engine.dispose()
+        await engine.dispose()
+
+    print("🎉 Данные перенесены в PostgreSQL")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Перенос базы HH.ru Auto Apply из SQLite в PostgreSQL")
+    parser.add_argument("--source", default="hh_auto_apply.db",
+                        help="путь к файлу SQLite (по умолчанию ./hh_auto_apply.db)")
+    args = parser.parse_args()
+    if not asyncio.run(copy_database(args.source)):
+        sys.exit(1)
@@ -44,9 +44,9 @@ class HHAPIDemo:
         return response.json()
     
     def get_applications(self) -> list:
-        """Получение списка откликов"""
+        """Получение первой страницы откликов"""
         response = self.session.get(f"{self.base_url}/api/applications")
-        return response.json()
+        return response.json()["items"]
     
     def test_connection(self) -> Dict[str, Any]:
         """Тест подключения к API HH.ru"""
@@ -2,23 +2,24 @@ import asyncio
 
 import uvicorn
 
+from app.config import settings
 from app.database import init_db
 
 
-async def main():
+def main():
     """Главная функция для запуска приложения"""
     # Инициализируем базу данных
-    await init_db()
+    asyncio.run(init_db())
     
-    # Запускаем сервер
+    # Запускаем сервер (uvicorn создает собственный цикл событий)
     uvicorn.run(
         "app.api:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        reload=settings.web_reload,
         log_level="info"
     )
 
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    main() 
\ No newline at end of file
@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import sys
 import os
@@ -8,34 +9,46 @@ from app.utils.auth import get_password_hash
 from app.database import User, SystemSettings
 from sqlalchemy import select
 
-async def migrate_database():
+
+# Начальные настройки системы: ключ, значение, описание
+DEFAULT_SETTINGS = [
+    ("check_interval_minutes", "30", "Интервал проверки новых вакансий в минутах"),
+    ("max_applications_per_day", "50", "Максимальное количество откликов в день"),
+    ("max_users", "100", "Максимальное количество пользователей"),
+]
+
+
+async def drop_tables():
+    """Удаление всех таблиц (данные будут потеряны)"""
+    from app.database import engine, Base
+    from sqlalchemy import text
+    async with engine.begin() as conn:
+        # drop_all удаляет таблицы в порядке внешних ключей - это требуется PostgreSQL
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS schema_migrations")))
+        print("🗑️ Старые таблицы удалены")
+
+
+async def migrate_database(reset: bool = False):
     print("🔄 Начинаю миграцию базы данных...")
-    
+
     try:
-        # Удаляем старые таблицы и создаем новые
-        from app.database import engine
-        from sqlalchemy import text
-        async with engine.begin() as conn:
-            # Удаляем все таблицы
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS job_searches")))
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS applications")))
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS hh_user_credentials")))
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS request_logs")))
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS system_settings")))
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS oauth_states")))
-            await conn.run_sync(lambda sync_conn: sync_conn.execute(text("DROP TABLE IF EXISTS users")))
-            print("🗑️ Старые таблицы удалены")
-        
-        # Инициализируем новую структуру базы
-        await init_db()
-        print("✅ Новая структура базы данных создана")
-        
+        if reset:
+            await drop_tables()
+
+        # Создаем недостающие таблицы и применяем новые миграции - существующие данные сохраняются
+        applied = await init_db()
+        if applied:
+            print(f"✅ Применены миграции: {', '.join(str(version) for version in applied)}")
+        else:
+            print("ℹ️ Структура базы данных уже актуальна")
+
         async with AsyncSessionLocal() as session:
             # Создаем администратора по умолчанию
             admin_exists = await session.execute(
                 select(User).where(User.username == "admin")
             )
-            
+
             if not admin_exists.scalar_one_or_none():
                 admin_user = User(
                     username="admin",
@@ -49,39 +62,30 @@ async def migrate_database():
                 print("✅ Администратор создан (логин: admin, пароль: admin123)")
             else:
                 print("ℹ️ Администратор уже существует")
-            
-            # Устанавливаем начальные настройки системы
-            await auto_apply_service.update_setting(
-                session, 
-                "check_interval_minutes", 
-                "30", 
-                "Интервал проверки новых вакансий в минутах"
-            )
-            await auto_apply_service.update_setting(
-                session, 
-                "max_applications_per_day", 
-                "50", 
-                "Максимальное количество откликов в день"
-            )
-            await auto_apply_service.update_setting(
-                session, 
-                "max_users", 
-                "100", 
-                "Максимальное количество пользователей"
-            )
+
+            # Устанавливаем начальные настройки системы, не затирая измененные администратором
+            result = await session.execute(select(SystemSettings.key))
+            existing_keys = set(result.scalars().all())
+            for key, value, description in DEFAULT_SETTINGS:
+                if key not in existing_keys:
+                    await auto_apply_service.update_setting(session, key, value, description)
             print("✅ Начальные настройки системы установлены")
-        
+
         print("🎉 Миграция базы данных завершена успешно!")
         print("\n📝 Следующие шаги:")
         print("1. Запустите приложение: python main.py")
         print("2. Откройте http://localhost:8000/register")
         print("3. Создайте аккаунт или войдите как admin/admin123")
         print("4. Подключите HH.ru через OAuth")
-        
+
     except Exception as e:
         print(f"❌ Ошибка миграции: {e}")
         import traceback
         traceback.print_exc()
 
 if __name__ == "__main__":
-    asyncio.run(migrate_database()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Миграция базы данных HH.ru Auto Apply")
+    parser.add_argument("--reset", action="store_true",
+                        help="удалить все таблицы и создать базу заново (все данные будут потеряны)")
+    args = parser.parse_args()
+    asyncio.run(migrate_database(reset=args.reset))
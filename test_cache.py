@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Проверка кэша с объединением одновременных загрузок (app.utils.cache.TTLCache).
+
+Запуск: python test_cache.py (или pytest test_cache.py)
+"""
+
+import asyncio
+import os
+import sys
+
+# Добавляем текущую директорию в путь
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.utils.cache import TTLCache
+
+
+async def check_cancelled_waiter_keeps_load():
+    """Отмена одного ожидающего не должна отменять загрузку для остальных"""
+    cache = TTLCache(max_size=10, ttl=60)
+    calls = 0
+
+    async def slow_loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.3)
+        return "page"
+
+    # Первый вызов начинает загрузку и отменяется по таймауту, второй ждет ее результата
+    first = asyncio.create_task(asyncio.wait_for(cache.get_or_load("search", slow_loader), 0.1))
+    await asyncio.sleep(0.01)
+    second = asyncio.create_task(cache.get_or_load("search", slow_loader))
+    results = await asyncio.gather(first, second, return_exceptions=True)
+
+    assert isinstance(results[0], asyncio.TimeoutError), results[0]
+    assert results[1] == "page", results[1]
+    assert calls == 1, calls
+    assert cache.get("search") == "page"
+
+
+async def check_failed_load_is_shared():
+    """Ошибка загрузки передается всем ожидающим и не кэшируется"""
+    cache = TTLCache(max_size=10, ttl=60)
+
+    async def failing_loader():
+        await asyncio.sleep(0.05)
+        raise ValueError("HH.ru недоступен")
+
+    results = await asyncio.gather(
+        cache.get_or_load("search", failing_loader),
+        cache.get_or_load("search", failing_loader),
+        return_exceptions=True
+    )
+    assert all(isinstance(result, ValueError) for result in results), results
+    assert cache.get("search") is None
+
+
+def test_cancelled_waiter_keeps_load():
+    asyncio.run(check_cancelled_waiter_keeps_load())
+
+
+def test_failed_load_is_shared():
+    asyncio.run(check_failed_load_is_shared())
+
+
+if __name__ == "__main__":
+    asyncio.run(check_cancelled_waiter_keeps_load())
+    asyncio.run(check_failed_load_is_shared())
+    print("🎉 Кэш работает корректно")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Проверка планов частых запросов: дашборд, логи и планировщик должны
+использовать индексы, а не полный просмотр таблиц.
+
+Запуск: python test_query_plans.py (или pytest test_query_plans.py)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Проверяем на отдельной временной базе, чтобы не трогать рабочую
+DB_PATH = os.path.join(tempfile.gettempdir(), "hh_query_plans.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{DB_PATH}"
+
+# Добавляем текущую директорию в путь
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.database import engine, init_db
+from app.services import auto_apply_service
+from app.utils.credentials import credentials_cache
+from app.utils.pagination import encode_cursor
+
+
+def hot_queries():
+    """Запросы из сервисов и API: строятся теми же методами, которыми их выполняет приложение"""
+    now = datetime.now()
+    # Курсор второй страницы: сравнение по времени и id последней строки первой
+    cursor = encode_cursor(now, 100)
+    return [
+        ("Отклики за сегодня", "applications", auto_apply_service.today_applications_query(1)),
+        ("Проверка дублей откликов", "applications", auto_apply_service.applied_vacancy_ids_query(1, ["1", "2"])),
+        ("Список откликов", "applications", auto_apply_service.applications_query(1)),
+        ("Следующая страница откликов", "applications",
+         auto_apply_service.applications_query(1, status="success", cursor=cursor)),
+        ("Логи запросов", "request_logs", auto_apply_service.request_logs_query(1)),
+        ("Следующая страница логов", "request_logs", auto_apply_service.request_logs_query(1, cursor=cursor)),
+        ("Последние учетные данные", "hh_user_credentials", credentials_cache.latest_query(1)),
+        ("Учетные данные пачкой", "hh_user_credentials", credentials_cache.latest_many_query([1, 2])),
+        ("Активные поиски пользователя", "job_searches", auto_apply_service.job_searches_query(1)),
+        ("Поиски, которые пора запускать", "job_searches",
+         auto_apply_service.leases.due_query(now, settings.scheduler_claim_batch_size)),
+    ]
+
+
+async def check_query_plans():
+    """Ни один частый запрос не должен просматривать таблицу целиком"""
+    print("🔍 Проверка планов запросов...")
+
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    await init_db()
+
+    failures = []
+    async with engine.connect() as conn:
+        for name, table, query in hot_queries():
+            sql = str(query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+            result = await conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+            plan = [row[-1] for row in result.all()]
+
+            # "SCAN <таблица>" без индекса - полный просмотр таблицы
+            full_scans = [step for step in plan if step.strip() == f"SCAN {table}"]
+            if full_scans:
+                failures.append(name)
+                print(f"❌ {name}: {plan}")
+            else:
+                print(f"✅ {name}: {'; '.join(plan)}")
+
+    await engine.dispose()
+    os.remove(DB_PATH)
+    return failures
+
+
+def test_query_plans():
+    failures = asyncio.run(check_query_plans())
+    assert not failures, f"Запросы без индекса: {', '.join(failures)}"
+
+
+if __name__ == "__main__":
+    failures = asyncio.run(check_query_plans())
+    if failures:
+        print(f"\n⚠️  Запросы без индекса: {', '.join(failures)}")
+        sys.exit(1)
+    print("\n🎉 Все частые запросы используют индексы")